@@ -5,7 +5,6 @@ import logging
 import sys
 import traceback
 from threading import Thread
-from time import sleep
 from tokenize import String
 from typing import Optional
 
@@ -232,7 +231,7 @@ class AstroLive:
                 except KeyboardInterrupt:
                     break
 
-                sleep(3)
+                await asyncio.sleep(3)
 
         return None
 
@@ -1,4 +1,6 @@
 """Parses the configuration file and create a configuration object"""
+import copy
+import functools
 import logging
 import os.path
 from os import PathLike
@@ -8,6 +10,23 @@ import yaml
 
 logger = logging.getLogger(__name__)
 
+# The libyaml based loader is much faster, fall back to pure python if missing
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@functools.lru_cache(maxsize=16)
+def _parse_yaml(path: str, mtime_ns: int):
+    """Parses a yaml file, cached until the modification time changes"""
+
+    with open(path) as yaml_config:
+        return yaml.load(yaml_config, Loader=_YAML_LOADER)
+
+
+def _load_yaml(path: str):
+    """Returns a private copy of the parsed yaml file, includes are expanded in place"""
+
+    return copy.deepcopy(_parse_yaml(path, os.stat(path).st_mtime_ns))
+
 
 class Config:
     """Config class"""
@@ -93,10 +112,9 @@ class Config:
         config = {}
         for src in source:
             try:
-                with open(src) as yaml_config:
-                    logger.info("Loading configuration from: %s", src)
-                    config_list = yaml.safe_load(yaml_config)
-                    config.update(config_list)
+                config_list = _load_yaml(src)
+                logger.info("Loading configuration from: %s", src)
+                config.update(config_list)
             except IOError:
                 logger.info("Non existing config file: %s", src)
         # expand includes
@@ -1,12 +1,15 @@
 """Implementation of the Alpaca Connector"""
+import itertools
+import json
 import logging
 import random
 from typing import Callable, Iterable, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout
 
-from .const import REQUESTS_TIMEOUTS
+from .const import ALPACA_POOL_SIZE, REQUESTS_TIMEOUTS
 from .errors import (
     AlpacaError,
     AlpacaHttp400Error,
@@ -53,7 +56,15 @@ class AlpacaConnector(Connector):
 
     def __init__(self) -> None:
         self.client_id = random.randint(0, 4294967295)
-        self.session_id = 0
+        # Shared by all device threads, next() on a count is thread-safe
+        self._transaction_ids = itertools.count(1)
+        # Keep-alive connections to the Alpaca server, reused by all device threads
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=ALPACA_POOL_SIZE)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Device URL prefix by component, the options do not change after setup
+        self._device_urls = {}
         _LOGGER.info("Alpaca connector created, ClientId=%d", self.client_id)
         super().__init__()
 
@@ -111,10 +122,10 @@ class AlpacaConnector(Connector):
             data: Data to send
         """
 
-        data.update(self._base_data_for_request())
+        self._add_base_data(data)
         try:
-            response = requests.get(url, params=data, timeout=REQUESTS_TIMEOUTS)
-            self.__check_error(response)
+            response = self._session.get(url, params=data, timeout=REQUESTS_TIMEOUTS)
+            reply = self.__check_error(response)
         except Timeout as exc:
             # _LOGGER.error('Timeout has been raised.')
             raise RequestConnectionError from exc
@@ -122,7 +133,33 @@ class AlpacaConnector(Connector):
             _LOGGER.error(f"Connection to {url} failed")
             raise RequestConnectionError from exc
 
-        return response.json()["Value"]
+        return reply["Value"]
+
+    def get_response(
+        self, component: "Component", variable: str, headers=None, stream=False, **data
+    ) -> requests.Response:
+        """Send an HTTP GET request to an Alpaca server and return the raw response.
+
+        Used for replies which are not plain JSON like the image bytes, the
+        caller has to check the response for errors.
+
+        Args:
+            component (Component): Calling component
+            variable (str): Attribute to get from server.
+            headers (dict): Additional request headers.
+            stream (bool): Do not read the body before returning.
+            **data: Data to send with request.
+        """
+
+        url = self._url(component=component, variable=variable)
+        self._add_base_data(data)
+        try:
+            return self._session.get(url, params=data, headers=headers, stream=stream, timeout=REQUESTS_TIMEOUTS)
+        except Timeout as exc:
+            raise RequestConnectionError from exc
+        except IOError as exc:
+            _LOGGER.error("Connection to %s failed", url)
+            raise RequestConnectionError from exc
 
     def put(self, component: "Component", variable: str, **data):
         """Send an HTTP PUT request to an Alpaca server and check response for errors.
@@ -143,24 +180,27 @@ class AlpacaConnector(Connector):
             data: Data to send
         """
 
-        data.update(self._base_data_for_request())
+        self._add_base_data(data)
         try:
-            response = requests.put(url, data=data, timeout=REQUESTS_TIMEOUTS)
-            self.__check_error(response)
+            response = self._session.put(url, data=data, timeout=REQUESTS_TIMEOUTS)
+            reply = self.__check_error(response)
         except Timeout as exc:
             # _LOGGER.error('Timeout has been raised.')
             raise RequestConnectionError from exc
 
-        return response.json()
+        return reply
 
-    def _base_data_for_request(self):
-        """Define the base data with cliend id and session id"""
+    def _add_base_data(self, data: dict):
+        """Add the client id and transaction id to the request data
 
-        self.session_id += 1
-        return {"ClientID": self.client_id, "ClientTransactionID": self.session_id}
+        Args:
+            data: The keyword arguments of the call, a fresh dict which is filled in place
+        """
 
-    @staticmethod
-    def _url(component: "Component", variable: str):
+        data["ClientID"] = self.client_id
+        data["ClientTransactionID"] = next(self._transaction_ids)
+
+    def _url(self, component: "Component", variable: str):
         """Build the URL
 
         Args:
@@ -168,15 +208,17 @@ class AlpacaConnector(Connector):
             variable: The function to handle
         """
 
-        url = "/".join(
-            [
-                component.get_option_recursive("address"),
-                component.component_options["kind"],
-                str(component.component_options.get("device_number", 0)),
-                variable,
-            ]
-        )
-        return url
+        try:
+            device_url = self._device_urls[component]
+        except KeyError:
+            device_url = self._device_urls[component] = "/".join(
+                [
+                    component.get_option_recursive("address").rstrip("/"),
+                    component.component_options["kind"],
+                    str(component.component_options.get("device_number", 0)),
+                ]
+            )
+        return f"{device_url}/{variable}"
 
     @staticmethod
     def __check_error(response: requests.Response):
@@ -184,6 +226,9 @@ class AlpacaConnector(Connector):
 
         Args:
             response (Response): Response from Alpaca server to check.
+
+        Returns:
+            The decoded JSON reply, so callers do not parse it again.
         """
         if response.status_code == 400:
             _LOGGER.error("Alpaca HTTP 400 error, %s for %s", response.text, response.url)
@@ -192,10 +237,17 @@ class AlpacaConnector(Connector):
             _LOGGER.error("Alpaca HTTP 500 error, %s for %s", response.text, response.url)
             raise AlpacaHttp500Error(response.text)
 
-        j = response.json()
+        # json.loads detects the encoding of the bytes itself, skipping the text decoding of Response.json
+        try:
+            j = json.loads(response.content)
+        except ValueError as exc:
+            # e.g. a 404 page of the server or an error page of a proxy
+            _LOGGER.error("Alpaca HTTP %d reply is no JSON, %s for %s", response.status_code, response.text, response.url)
+            raise AlpacaHttpError(f"HTTP {response.status_code}: {response.text}") from exc
         if j["ErrorNumber"] != 0:
             _LOGGER.error("Alpaca error, code=%d, msg=%s", j["ErrorNumber"], j["ErrorMessage"])
             raise AlpacaError(j["ErrorNumber"], j["ErrorMessage"])
+        return j
 
 
 _connector_classes = {"alpaca": AlpacaConnector}
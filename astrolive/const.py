@@ -5,6 +5,38 @@ API_ENDPOINT = "http://localhost:11111/api/v1"
 CLIENT_ID = 1
 
 REQUESTS_TIMEOUTS = (2, 30)
+# Keep-alive connections per Alpaca server
+ALPACA_POOL_SIZE = 16
+
+# Camera sensortype of RGGB Bayer sensors
+SENSOR_TYPE_RGGB = 2
+
+# Seconds the values read by Device.refresh_state are served by the state getters
+DEVICE_STATE_TTL = 0.05
+
+# Seconds a GET result is reused by the device, e.g. for several sensors reading it in one poll
+DEVICE_GET_TTL = 0.05
+
+# Seconds between two requests of Device.wait_until
+DEVICE_POLL_INTERVAL = 0.05
+
+# Commands are received at least once, states are published fire and forget with QoS 0
+MQTT_COMMAND_QOS = 1
+
+# Seconds queued messages wait for the broker connection before they are dropped
+MQTT_CONNECT_WAIT = 5
+
+# Queued publish calls sent by the MQTT looper in one run
+MQTT_MAX_BATCH = 256
+
+# Republish an unchanged device state after this many seconds
+STATE_REFRESH_INTERVAL = 300
+
+# Ask a connected device again for its connected state after this many seconds
+CONNECTED_CHECK_INTERVAL = 60
+
+# Republish the latest image file during the first seconds after start
+CAMERA_FILE_REPUBLISH_TIME = 180
 
 COLOR_BLACK = "1;30"
 COLOR_RED = "1;31"
@@ -20,6 +52,10 @@ IMAGE_STRETCH_FUNCTION = "asinh"
 IMAGE_MINMAX_PERCENT = [15, 95]  # [0.5, 95]
 IMAGE_MINMAX_VALUE = None
 IMAGE_INVERT = False
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WEBP_QUALITY = 80
+# Home Assistant serves MQTT camera images as image/jpeg, use .webp only with clients sniffing the format
+IMAGE_PUBLISH_FORMAT = ".jpg"
 
 # Devices
 DEVICE_TYPE_OBSERVATORY = "observatory"
@@ -1,15 +1,39 @@
 """Convert coordinates from string to Angle"""
-from astropy import units as u
-from astropy.coordinates import Angle
+import re
+
+# Plain "12.5", "12:30:15.5" or "12 30 15.5" strings, other notations are left to astropy
+_SEXAGESIMAL_RE = re.compile(r"^\s*([+-]?)(\d+(?:\.\d*)?)(?:[:\s]+(\d+(?:\.\d*)?)(?:[:\s]+(\d+(?:\.\d*)?))?)?\s*$")
+
+# Degrees per unit of the parsed string
+_DEG_PER_UNIT = {"hourangle": 15.0, "deg": 1.0}
+
+
+def _angle_deg(value, unit):
+    """Parse an angle string to degrees, astropy is imported on first use only"""
+
+    match = _SEXAGESIMAL_RE.match(value)
+    if match is not None:
+        sign, units, minutes, seconds = match.groups()
+        minutes = float(minutes or 0)
+        seconds = float(seconds or 0)
+        # Out of range fields are reported by astropy
+        if minutes < 60 and seconds < 60:
+            angle = float(units) + minutes / 60 + seconds / 3600
+            return (-angle if sign == "-" else angle) * _DEG_PER_UNIT[unit]
+
+    from astropy import units as u
+    from astropy.coordinates import Angle
+
+    return Angle(value, unit=getattr(u, unit)).deg
 
 
 def check_equatorial_coordinates(ra, dec):
     """Convert equatorial coordinates"""
 
     if isinstance(ra, str):
-        ra = Angle(ra, unit=u.hourangle).deg
+        ra = _angle_deg(ra, "hourangle")
     if isinstance(dec, str):
-        dec = Angle(dec, unit=u.deg).deg
+        dec = _angle_deg(dec, "deg")
     return ra, dec
 
 
@@ -17,7 +41,7 @@ def check_horizontal_coordinates(az, alt):
     """Convert horizonal coordinates"""
 
     if isinstance(az, str):
-        az = Angle(az, unit=u.deg).deg
+        az = _angle_deg(az, "deg")
     if isinstance(alt, str):
-        alt = Angle(alt, unit=u.deg).deg
+        alt = _angle_deg(alt, "deg")
     return az, alt
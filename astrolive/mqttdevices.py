@@ -1,41 +1,32 @@
 """Handler for MQTT communication"""
-import glob
+import asyncio
 import json
 import logging
 import os
 import time
-import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from time import sleep
+from functools import partial
 from typing import Callable, Iterable, Tuple
 
 import cv2
 import numpy as np
-from astropy import units as u
-from astropy.io import fits
-from astropy.visualization import (
-    AsinhStretch,
-    AsymmetricPercentileInterval,
-    LinearStretch,
-    LogStretch,
-    ManualInterval,
-    MinMaxInterval,
-    SinhStretch,
-    SqrtStretch,
-)
-from astropy.coordinates import SkyCoord # High-level coordinates
-from astropy.coordinates import Angle # Angles
 from cv2 import imencode
 
 from .const import (
+    CAMERA_FILE_REPUBLISH_TIME,
     CAMERA_SENSOR_TYPES,
     CAMERA_STATES,
     DEVICE_TYPE_CAMERA,
     DEVICE_TYPE_CAMERA_FILE,
     IMAGE_INVERT,
+    IMAGE_JPEG_QUALITY,
     IMAGE_MINMAX_PERCENT,
     IMAGE_MINMAX_VALUE,
+    IMAGE_PUBLISH_DIMENSIONS,
+    IMAGE_PUBLISH_FORMAT,
     IMAGE_STRETCH_FUNCTION,
+    IMAGE_WEBP_QUALITY,
     MANUFACTURER,
     SENSOR_TYPE,
     SENSOR_NAME,
@@ -44,6 +35,8 @@ from .const import (
     SENSOR_DEVICE_CLASS,
     SENSOR_STATE_CLASS,
     STATE_ON,
+    STATE_REFRESH_INTERVAL,
+    CONNECTED_CHECK_INTERVAL,
     STATE_OFF,
     TYPE_TEXT,
     DEVICE_CLASS_SWITCH,
@@ -65,6 +58,110 @@ from .observatory import (
 _LOGGER = logging.getLogger(__name__)
 logging.getLogger("mqtt").setLevel(logging.DEBUG)
 
+# Worker threads for blocking device calls, shared by the event loops of all devices
+_DEVICE_EXECUTOR = ThreadPoolExecutor(thread_name_prefix="device")
+
+# Online status payloads of the devices
+_LWT_ON = b"ON"
+_LWT_OFF = b"OFF"
+
+# Encoder parameters of the published image formats, JPEGs are plain baseline
+# since the optimized Huffman tables cost more time than they save bytes
+_ENCODE_PARAMS = {
+    ".jpg": [
+        int(cv2.IMWRITE_JPEG_QUALITY), IMAGE_JPEG_QUALITY,
+        int(cv2.IMWRITE_JPEG_OPTIMIZE), 0,
+        int(cv2.IMWRITE_JPEG_PROGRESSIVE), 0,
+    ],
+    ".webp": [int(cv2.IMWRITE_WEBP_QUALITY), IMAGE_WEBP_QUALITY],
+}
+
+# Compact JSON encoder for the device states and configurations
+_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def _encode_json(payload):
+    """Serialize a device state or configuration to a compact JSON payload.
+
+    Args:
+        payload (dict): The device state or configuration.
+
+    Returns:
+        The UTF-8 encoded JSON payload.
+    """
+
+    return _JSON_ENCODER.encode(payload).encode("utf-8")
+
+
+def _percentile_uint(img, percentiles):
+    """Compute percentiles of an unsigned 8 or 16 bit image from its histogram.
+
+    Gives the same result as np.percentile with linear interpolation, but
+    counts the pixel values in one pass instead of partitioning the image.
+
+    Args:
+        img (array): The image array.
+        percentiles (list): The percentiles to compute, in the range 0-100.
+
+    Returns:
+        Array of the pixel values at the given percentiles.
+    """
+
+    counts = np.cumsum(np.bincount(img.ravel()))
+    last = counts[-1] - 1
+    ranks = last * np.asarray(percentiles, dtype=np.float64) / 100
+    lower = np.floor(ranks)
+    lower_values = np.searchsorted(counts, lower, side="right")
+    upper_values = np.searchsorted(counts, np.minimum(lower + 1, last), side="right")
+    return lower_values + (ranks - lower) * (upper_values - lower_values)
+
+
+def _stretch_asinh(values, a=0.1):
+    """Asinh stretch, in place on values in the range 0-1."""
+
+    np.multiply(values, 1.0 / a, out=values)
+    np.arcsinh(values, out=values)
+    np.multiply(values, 1.0 / np.arcsinh(1.0 / a), out=values)
+
+
+def _stretch_sinh(values, a=1.0 / 3.0):
+    """Sinh stretch, in place on values in the range 0-1."""
+
+    np.multiply(values, 1.0 / a, out=values)
+    np.sinh(values, out=values)
+    np.multiply(values, 1.0 / np.sinh(1.0 / a), out=values)
+
+
+def _stretch_sqrt(values):
+    """Square root stretch, in place on values in the range 0-1."""
+
+    np.sqrt(values, out=values)
+
+
+def _stretch_log(values, a=1000.0):
+    """Logarithmic stretch, in place on values in the range 0-1."""
+
+    np.multiply(values, a, out=values)
+    np.log1p(values, out=values)
+    np.multiply(values, 1.0 / np.log(a + 1.0), out=values)
+
+
+def _stretch_linear(values):
+    """Linear stretch, leaves the values unchanged."""
+
+
+# Every possible pixel value of 8 and 16 bit images, the input of the lookup tables
+_LUT_INDEX = {np.dtype(dtype): np.arange(np.iinfo(dtype).max + 1, dtype=dtype) for dtype in (np.uint8, np.uint16)}
+
+# Stretches by name, their defaults match the astropy.visualization stretches
+_STRETCHES = {
+    "asinh": _stretch_asinh,
+    "sinh": _stretch_sinh,
+    "sqrt": _stretch_sqrt,
+    "log": _stretch_log,
+    "linear": _stretch_linear,
+}
+
 
 class Connector:
     """Connector class"""
@@ -96,8 +193,12 @@ class Connector:
 class MqttConnector(Connector):
     """Specialized MQTT Connector"""
 
+    # Pairs of state key and device method, used by the default _publish
+    FIELDS: tuple = ()
+
     def __init__(self, *args, **kwargs) -> None:
         # options = args[0]
+        # The shared MqttHandler, all devices publish through its single MQTT client
         self._publisher = kwargs["publisher"]
         if self._publisher is None:
             _LOGGER.error("MQTT Publisher not existing")
@@ -105,6 +206,20 @@ class MqttConnector(Connector):
 
         # Used by the update threads to hold information
         self._store = {}
+        # Last published state payload and publish time per device
+        self._last_state = {}
+        # Last published online status
+        self._last_lwt = None
+        # Time until which the device is assumed to be connected
+        self._connected_until = 0.0
+        # State keys and bound device methods of FIELDS, set by _bind_fields
+        self._field_keys = ()
+        self._field_calls = ()
+        # Device topics, set by _init_topics
+        self._topic_lwt = None
+        self._topic_state = None
+        self._topic_screen = None
+        self._publisher.add_device_connector(self)
         super().__init__()
 
     def connect(self, *args, **kwargs):
@@ -131,81 +246,77 @@ class MqttConnector(Connector):
         _LOGGER.debug("  Functions %s", device_functions)
 
         sys_id_ = sys_id.replace(".", "_")
+        device_topic = f"astrolive/{device_type}/{sys_id_}"
+        # Available while both AstroLive and the device are online, the broker
+        # sets astrolive/lwt to OFF via the last will if AstroLive goes away
+        availability = [
+            {"topic": "astrolive/lwt", "payload_available": "ON", "payload_not_available": "OFF"},
+            {"topic": f"{device_topic}/lwt", "payload_available": "ON", "payload_not_available": "OFF"},
+        ]
         device_friendly_name_cap = device_friendly_name
         device_friendly_name_low = device_friendly_name.lower().replace(" ", "_")
-
+        device = {
+            "identifiers": [sys_id],
+            "name": f"AstroLive {device_friendly_name_cap}",
+            "model": device_friendly_name_cap,
+            "manufacturer": MANUFACTURER,
+        }
+        # Keys shared by the configurations of all functions of the device
+        config_template = {
+            "state_topic": f"{device_topic}/state",
+            "availability": availability,
+            "availability_mode": "all",
+            "payload_on": STATE_ON,
+            "payload_off": STATE_OFF,
+            "device": device,
+        }
+
+        configs = []
         for function in device_functions:
             # Generic for all devices one configuration topic for each functionality
+            function_type = function[SENSOR_TYPE]
             device_function_cap = function[SENSOR_NAME]
             device_function_low = function[SENSOR_NAME].lower().replace(" ", "_")
 
-            root_topic = (
-                "homeassistant/"
-                + function[SENSOR_TYPE]
-                + "/astrolive/"
-                + device_friendly_name_low
-                + "_"
-                + device_function_low
-                + "/"
-            )
+            root_topic = f"homeassistant/{function_type}/astrolive/{device_friendly_name_low}_{device_function_low}/"
             config = {
                 "name": device_function_cap,
-                "state_topic": "astrolive/" + device_type + "/" + sys_id_ + "/state",
                 "state_class": function[SENSOR_STATE_CLASS],
                 "device_class": function[SENSOR_DEVICE_CLASS],
                 "icon": function[SENSOR_ICON],
-                "availability_topic": "astrolive/" + device_type + "/" + sys_id_ + "/lwt",
-                "payload_available": "ON",
-                "payload_not_available": "OFF",
-                "payload_on": STATE_ON,
-                "payload_off": STATE_OFF,
-                "unique_id": device_type + "_" + sys_id_ + "_" + device_function_low,
-                "value_template": "{{ value_json." + device_function_low + " }}",
-                "device": {
-                    "identifiers": [sys_id],
-                    "name": "AstroLive " + device_friendly_name_cap,
-                    "model": device_friendly_name_cap,
-                    "manufacturer": MANUFACTURER,
-                },
+                "unique_id": f"{device_type}_{sys_id_}_{device_function_low}",
+                "value_template": f"{{{{ value_json.{device_function_low} }}}}",
+                **config_template,
             }
             if function[SENSOR_UNIT] != "" and function[SENSOR_UNIT] is not None:
                 config["unit_of_measurement"] = function[SENSOR_UNIT]
 
-            if function[SENSOR_TYPE] == TYPE_TEXT:
-                config["command_topic"] = ("astrolive/" + device_type + "/" + sys_id_ + "/cmd",)
+            if function_type == TYPE_TEXT:
+                config["command_topic"] = f"{device_topic}/cmd"
 
             if function[SENSOR_DEVICE_CLASS] == DEVICE_CLASS_SWITCH:
-                config["command_topic"] = (
-                    "astrolive/" + device_type + "/" + sys_id_ + "/set" + "_" + device_function_low
-                )
+                config["command_topic"] = f"{device_topic}/set_{device_function_low}"
                 # Subscribe to command topic of the switch
-                await self._publisher.subsribe_mqtt(
-                    "astrolive/" + device_type + "/" + sys_id_ + "/set" + "_" + device_function_low
-                )
-
-            await self._publisher.publish_mqtt(root_topic + "config", json.dumps(config), qos=0, retain=True)
+                await self._publisher.subsribe_mqtt(config["command_topic"])
 
-        _LOGGER.debug("Published MQTT Config for a %s", device_type)
+            configs.append((f"{root_topic}config", _encode_json(config), 0, True))
 
         if device_type in (DEVICE_TYPE_CAMERA, DEVICE_TYPE_CAMERA_FILE):
             # If the device is a camera or camera_file we create a camera entity configuration
-            root_topic = "homeassistant/camera/astrolive/" + device_friendly_name_low + "/"
+            root_topic = f"homeassistant/camera/astrolive/{device_friendly_name_low}/"
             config = {
                 "name": device_friendly_name_cap,
-                "topic": "astrolive/" + device_type + "/" + sys_id_ + "/screen",
-                "availability_topic": "astrolive/" + device_type + "/" + sys_id_ + "/lwt",
-                "payload_available": "ON",
-                "payload_not_available": "OFF",
-                "unique_id": device_type + "_" + device_friendly_name_low + "_" + sys_id_,
-                "device": {
-                    "identifiers": [sys_id],
-                    "name": "AstroLive " + device_friendly_name_cap,
-                    "model": device_friendly_name_cap,
-                    "manufacturer": MANUFACTURER,
-                },
+                "topic": f"{device_topic}/screen",
+                "availability": availability,
+                "availability_mode": "all",
+                "unique_id": f"{device_type}_{device_friendly_name_low}_{sys_id_}",
+                "device": device,
             }
-            await self._publisher.publish_mqtt(root_topic + "config", json.dumps(config), qos=0, retain=True)
-            _LOGGER.debug("Published MQTT Camera Config for a %s", device_type)
+            configs.append((f"{root_topic}config", _encode_json(config), 0, True))
+
+        # All configurations of the device are queued for the publisher at once
+        await self._publisher.publish_mqtt_many(configs)
+        _LOGGER.debug("Published MQTT Config for a %s", device_type)
 
         return None
 
@@ -244,40 +355,50 @@ class MqttConnector(Connector):
             The normalized image array, in the form in an integer arrays with values in the range 0-255.
         """
 
-        # Setting up the transform with the stretch
-        if stretch == "asinh":
-            transform = AsinhStretch()
-        elif stretch == "sinh":
-            transform = SinhStretch()
-        elif stretch == "sqrt":
-            transform = SqrtStretch()
-        elif stretch == "log":
-            transform = LogStretch()
-        elif stretch == "linear":
-            transform = LinearStretch()
-
-        # transform = LinearStretch(slope=0.5, intercept=0.5) + SinhStretch() + LinearStretch(slope=2, intercept=-1)
-        transform += SinhStretch()
-
-        # Adding the scaling to the transform
+        img = np.asarray(img_arr)
+
+        # Interval of pixel values which is scaled to [0,1]
         if minmax_percent is not None:
-            transform += AsymmetricPercentileInterval(*minmax_percent)
+            if img.dtype in (np.uint8, np.uint16):
+                vmin, vmax = _percentile_uint(img, minmax_percent)
+            else:
+                values = img if np.issubdtype(img.dtype, np.integer) else img[np.isfinite(img)]
+                vmin, vmax = np.percentile(values, minmax_percent)
 
             if minmax_value is not None:
                 _LOGGER.error("Both minmax_percent and minmax_value are set, minmax_value will be ignored.")
         elif minmax_value is not None:
-            transform += ManualInterval(*minmax_value)
+            vmin, vmax = minmax_value
+            vmin = np.nanmin(img) if vmin is None else vmin
+            vmax = np.nanmax(img) if vmax is None else vmax
         else:  # Default, scale the entire image range to [0,1]
-            transform += MinMaxInterval()
+            vmin, vmax = np.nanmin(img), np.nanmax(img)
+
+        # For 8 and 16 bit images every possible pixel value is stretched once
+        # and the image is then mapped through this lookup table in one pass
+        use_lut = img.dtype in (np.uint8, np.uint16)
+        values = _LUT_INDEX[img.dtype] if use_lut else img
+
+        # All further steps work in place on a single float32 buffer
+        norm_img = np.subtract(values, vmin, dtype=np.float32)
+        np.multiply(norm_img, 1.0 / (vmax - vmin) if vmax > vmin else 0.0, out=norm_img)
+        np.clip(norm_img, 0.0, 1.0, out=norm_img)
 
-        # Performing the transform and then putting it into the integer range 0-255
-        norm_img = transform(img_arr)
-        norm_img = np.multiply(256, norm_img, out=norm_img)
-        norm_img = norm_img.astype(np.uint16)
+        # The sinh stretch darkens the background before the selected stretch
+        # brightens the faint parts again, this gives the published contrast
+        _stretch_sinh(norm_img)
+        _STRETCHES[stretch](norm_img)
+
+        # Putting it into the integer range 0-255
+        np.multiply(norm_img, 255, out=norm_img)
+        norm_img = norm_img.astype(np.uint8)
 
         # Applying invert if requested
         if invert:
-            norm_img = 256 - norm_img
+            np.subtract(255, norm_img, out=norm_img)
+
+        if use_lut:
+            norm_img = np.take(norm_img, img)
 
         return norm_img
 
@@ -323,16 +444,16 @@ class MqttConnector(Connector):
             ratio = width / float(image_width)
             dim = (width, int(image_height * ratio))
 
+        # nothing to do if the image already has the requested size
+        if dim == (image_width, image_height):
+            return image
+
         # resize the image
         resized = cv2.resize(image, dim, interpolation=inter)
 
         # return the resized image
         return resized
 
-
-class Telescope(MqttConnector):
-    """MQTT Device Telescope"""
-
     async def publish_loop(self, sys_id, device, device_type, interval):
         """Publish the device state in an endless loop
 
@@ -343,173 +464,408 @@ class Telescope(MqttConnector):
             interval (int): Update interval.
         """
 
-        start = time.time()
+        self._init_topics(sys_id, device_type)
+        self._bind_fields(device)
+        start = next_run = time.monotonic()
         while True:
             try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_telescope(sys_id, device, device_type)
-                sleep(interval)
+                # Time since the loop started, the same for every run however long _publish takes
+                execution_time = next_run - start
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
+                await self._publish(sys_id, device, device_type, execution_time)
+                next_run = await self._sleep_until(next_run + interval)
             except KeyboardInterrupt:
                 break
             except (RequestConnectionError, DeviceResponseError):
                 _LOGGER.error("Stopping thread for %s", sys_id)
                 break
         _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
 
-    async def _publish_telescope(self, sys_id, device, device_type):
-        """Publish telescope state
+    async def _publish(self, sys_id, device, device_type, execution_time):
+        """Publish the device state built from FIELDS
 
         Args:
             sys_id (string): ID of the device.
             device (Device): The device.
             device_type (string): Type of the device.
+            execution_time (int): Duration of the thread is running.
         """
 
-        sys_id_ = sys_id.replace(".", "_")
-
         _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
         try:
-            if device.connected():
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
-                state = {
-                    "at_home": "on" if device.athome() else "off",
-                    "at_park": "on" if device.atpark() else "off",
-                    "altitude": round(device.altitude(), 3),
-                    "azimuth": round(device.azimuth(), 3),
-                    "declination": round(device.declination(), 3),
-                    "declination_rate": round(device.declinationrate(), 3),
-                    "guiderate_declination": round(device.guideratedeclination(), 3),
-                    "right_ascension": round(device.rightascension(), 3),
-                    "right_ascension_rate": round(device.rightascensionrate(), 3),
-                    "guiderate_right_ascension": round(device.guideraterightascension(), 3),
-                    "side_of_pier": device.sideofpier(),
-                    "site_elevation": round(device.siteelevation(), 3),
-                    "site_latitude": round(device.sitelatitude(), 3),
-                    "site_longitude": round(device.sitelongitude(), 3),
-                    "slewing": "on" if device.slewing() else "off",
-                }
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
+            if self._is_connected(device):
+                values = await self._gather_calls(self._field_calls)
+                state = dict(zip(self._field_keys, values))
+                await self._publish_state(sys_id, state)
             else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+                await self._publish_offline(sys_id)
         except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+            await self._publish_offline(sys_id)
             _LOGGER.error("%s: Not connected", sys_id)
             raise rcedre
 
+    def _bind_fields(self, device):
+        """Resolve the device methods listed in FIELDS once.
 
-class Camera(MqttConnector):
-    """MQTT Device Camera"""
+        Args:
+            device (Device): The device.
+        """
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the device state in an endless loop
+        self._field_keys = tuple(key for key, _ in self.FIELDS)
+        self._field_calls = tuple(getattr(device, method) for _, method in self.FIELDS)
+
+    def _init_topics(self, sys_id, device_type):
+        """Build the MQTT topics of the device once.
+
+        Args:
+            sys_id (string): ID of the device.
+            device_type (string): Type of the device.
+        """
+
+        sys_id_ = sys_id.replace(".", "_")
+        self._topic_lwt = f"astrolive/{device_type}/{sys_id_}/lwt"
+        self._topic_state = f"astrolive/{device_type}/{sys_id_}/state"
+        self._topic_screen = f"astrolive/{device_type}/{sys_id_}/screen"
+
+    async def _sleep_until(self, deadline):
+        """Sleep until the next update is due.
+
+        If the deadline has already passed, the missed update is not caught
+        up and the schedule continues from now.
+
+        Args:
+            deadline (float): Due time of the next update, from time.monotonic().
+
+        Returns:
+            The due time the schedule continues from.
+        """
+
+        now = time.monotonic()
+        if deadline < now:
+            await asyncio.sleep(0)
+            return now
+        await asyncio.sleep(deadline - now)
+        return deadline
+
+    async def _gather_calls(self, calls, return_exceptions=False):
+        """Run blocking device calls concurrently in the shared worker threads.
+
+        Args:
+            calls (list): Callables without arguments, e.g. device methods.
+            return_exceptions (bool): Return exceptions instead of raising them.
+
+        Returns:
+            List of the results in the order of the calls.
+        """
+
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            *[loop.run_in_executor(_DEVICE_EXECUTOR, call) for call in calls],
+            return_exceptions=return_exceptions,
+        )
+
+    def _is_connected(self, device):
+        """Returns the connected state of the device.
+
+        A connected device is only asked again after CONNECTED_CHECK_INTERVAL
+        seconds. Errors while reading the device reset this via _publish_offline.
+        The cached constants of a device coming back online are dropped.
+
+        Args:
+            device (Device): The device.
+
+        Returns:
+            True if the device is connected.
+        """
+
+        now = time.monotonic()
+        if now < self._connected_until:
+            return True
+        connected = device.connected()
+        if connected and self._connected_until == 0.0:
+            # Back online, the device may have been power-cycled or reconfigured meanwhile
+            device.invalidate()
+        self._connected_until = now + CONNECTED_CHECK_INTERVAL if connected else 0.0
+        return connected
+
+    async def _publish_state(self, sys_id, state):
+        """Publish the device state unless it is unchanged since the last publish.
+
+        An unchanged state is republished after STATE_REFRESH_INTERVAL seconds
+        together with the online status, so that late subscribers catch up.
+
+        Args:
+            sys_id (string): ID of the device.
+            state (dict): The device state.
+        """
+
+        payload = _encode_json(state)
+        now = time.monotonic()
+        last = self._last_state.get(sys_id)
+        if last is not None and last[0] == payload:
+            if now - last[1] < STATE_REFRESH_INTERVAL:
+                _LOGGER.debug("%s: State unchanged", sys_id)
+                if self._lwt_due(_LWT_ON):
+                    await self._publisher.publish_mqtt(self._topic_lwt, _LWT_ON, retain=True)
+                return
+            # The retained online status is refreshed with the state, in case a transition got lost
+            self._last_lwt = None
+        self._last_state[sys_id] = (payload, now)
+        await self._publish_online_state(payload)
+
+    async def _publish_online_state(self, payload, screen=None):
+        """Publish the device state together with the online status.
+
+        The online status is only included if it changed.
+
+        Args:
+            payload (bytes): The encoded device state.
+            screen (bytes): Optional encoded image, published with the state.
+        """
+
+        messages = [(self._topic_state, payload)]
+        if screen is not None:
+            _LOGGER.info("Publish image to %s", self._topic_screen)
+            messages.append((self._topic_screen, screen))
+        if self._lwt_due(_LWT_ON):
+            messages.insert(0, (self._topic_lwt, _LWT_ON, 0, True))
+        await self._publisher.publish_mqtt_many(messages)
+
+    async def _publish_offline(self, sys_id):
+        """Publish the offline status of the device.
+
+        The last state and connected state are forgotten so that both are
+        queried and published again once the device is back online.
+
+        Args:
+            sys_id (string): ID of the device.
+        """
+
+        self._last_state.pop(sys_id, None)
+        self._connected_until = 0.0
+        if self._lwt_due(_LWT_OFF):
+            await self._publisher.publish_mqtt(self._topic_lwt, _LWT_OFF, retain=True)
+
+    def reset_published(self):
+        """Forget the published state and online status, both are published again on the next update.
+
+        Called by the MqttHandler from the paho network thread whenever the broker (re)connects.
+        """
+
+        self._last_state.clear()
+        self._last_lwt = None
+
+    def _lwt_due(self, status):
+        """Check if the online status needs to be published.
+
+        The status is retained by the broker, so it is only due if it changed.
+
+        Args:
+            status (bytes): The online status, _LWT_ON or _LWT_OFF.
+
+        Returns:
+            True if the status is due, it is then considered as published.
+        """
+
+        if self._last_lwt == status:
+            return False
+        self._last_lwt = status
+        return True
+
+    async def _process_image(self, sys_id, image_data):
+        """Resize, normalize and encode an image for publishing.
+
+        The image is scaled down first so that the stretch only has to
+        process the pixels which are actually published.
+
+        Args:
+            sys_id (string): ID of the device.
+            image_data (array): The raw image array.
+
+        Returns:
+            The image encoded as IMAGE_PUBLISH_FORMAT.
+        """
+
+        _LOGGER.debug("%s: Image dimensions " + str(image_data.shape), sys_id)
+
+        # OpenCV resizes only native 8/16 bit integer and float images
+        if image_data.dtype not in (np.uint8, np.uint16, np.int16, np.float32, np.float64):
+            image_data = image_data.astype(np.float32)
+
+        _LOGGER.debug("%s: Scaling image", sys_id)
+        resized = await self.image_resize(image_data, width=IMAGE_PUBLISH_DIMENSIONS[0])
+
+        _LOGGER.debug("%s: Normalizing image", sys_id)
+        normalized = await self.normalize_img(
+            resized,
+            IMAGE_STRETCH_FUNCTION,
+            IMAGE_MINMAX_PERCENT,
+            IMAGE_MINMAX_VALUE,
+            IMAGE_INVERT,
+        )
+
+        _LOGGER.debug("%s: Encoding image", sys_id)
+        encoded = imencode(IMAGE_PUBLISH_FORMAT, normalized, _ENCODE_PARAMS[IMAGE_PUBLISH_FORMAT])[1]
+
+        image_bytes = encoded.tobytes()
+        _LOGGER.debug("%s: Image size %s bytes", sys_id, len(image_bytes))
+        return image_bytes
+
+
+class Telescope(MqttConnector):
+    """MQTT Device Telescope"""
+
+    async def _publish(self, sys_id, device, device_type, execution_time):
+        """Publish telescope state
 
         Args:
             sys_id (string): ID of the device.
             device (Device): The device.
             device_type (string): Type of the device.
-            interval (int): Update interval.
+            execution_time (int): Duration of the thread is running.
         """
 
-        start = time.time()
-        while True:
-            try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_camera(sys_id, device, device_type)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
+        _LOGGER.debug("%s: Update", sys_id)
+        try:
+            if self._is_connected(device):
+                (
+                    at_home,
+                    at_park,
+                    altitude,
+                    azimuth,
+                    declination,
+                    declination_rate,
+                    guiderate_declination,
+                    right_ascension,
+                    right_ascension_rate,
+                    guiderate_right_ascension,
+                    side_of_pier,
+                    site_elevation,
+                    site_latitude,
+                    site_longitude,
+                    slewing,
+                ) = await self._gather_calls(
+                    [
+                        device.athome,
+                        device.atpark,
+                        device.altitude,
+                        device.azimuth,
+                        device.declination,
+                        device.declinationrate,
+                        device.guideratedeclination,
+                        device.rightascension,
+                        device.rightascensionrate,
+                        device.guideraterightascension,
+                        device.sideofpier,
+                        device.siteelevation,
+                        device.sitelatitude,
+                        device.sitelongitude,
+                        device.slewing,
+                    ]
+                )
+                state = {
+                    "at_home": "on" if at_home else "off",
+                    "at_park": "on" if at_park else "off",
+                    "altitude": round(altitude, 3),
+                    "azimuth": round(azimuth, 3),
+                    "declination": round(declination, 3),
+                    "declination_rate": round(declination_rate, 3),
+                    "guiderate_declination": round(guiderate_declination, 3),
+                    "right_ascension": round(right_ascension, 3),
+                    "right_ascension_rate": round(right_ascension_rate, 3),
+                    "guiderate_right_ascension": round(guiderate_right_ascension, 3),
+                    "side_of_pier": side_of_pier,
+                    "site_elevation": round(site_elevation, 3),
+                    "site_latitude": round(site_latitude, 3),
+                    "site_longitude": round(site_longitude, 3),
+                    "slewing": "on" if slewing else "off",
+                }
+                await self._publish_state(sys_id, state)
+            else:
+                await self._publish_offline(sys_id)
+        except (RequestConnectionError, DeviceResponseError) as rcedre:
+            await self._publish_offline(sys_id)
+            _LOGGER.error("%s: Not connected", sys_id)
+            raise rcedre
+
+
+class Camera(MqttConnector):
+    """MQTT Device Camera"""
 
-    async def _publish_camera(self, sys_id, device, device_type):
+    async def _publish(self, sys_id, device, device_type, execution_time):
         """Publish camera state and image
 
         Args:
             sys_id (string): ID of the device.
             device (Device): The device.
             device_type (string): Type of the device.
+            execution_time (int): Duration of the thread is running.
         """
 
-        sys_id_ = sys_id.replace(".", "_")
-
         _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
         try:
-            if device.connected():
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
+            if self._is_connected(device):
+                # Cached by the device until it is connected again
+                readout_modes = device.readoutmodes()
+                sensor_type = device.sensortype()
+                can_get_cooler_power = device.cangetcoolerpower()
+                image = device.component_options.get("image", False)
+
+                calls = [device.imageready, device.camerastate, device.ccdtemperature, device.readoutmode]
+                if can_get_cooler_power:
+                    calls += [device.cooleron, device.coolerpower]
+                required = len(calls)
+                if image:
+                    # Optional, these fail before the first image has been taken
+                    calls += [device.lastexposureduration, device.lastexposurestarttime, device.percentcompleted]
+                results = await self._gather_calls(calls, return_exceptions=True)
+                for result in results[:required]:
+                    if isinstance(result, BaseException):
+                        raise result
+
+                image_ready, camera_state, ccd_temperature, readout_mode = results[:4]
+                screen = None
                 state = {
-                    "camera_state": CAMERA_STATES[device.camerastate()],
-                    "ccd_temperature": device.ccdtemperature(),
-                    "image_ready": "on" if device.imageready() else "off",
-                    "readout_mode": device.readoutmodes()[device.readoutmode()],
-                    "sensor_type": CAMERA_SENSOR_TYPES[device.sensortype()],
+                    "camera_state": CAMERA_STATES[camera_state],
+                    "ccd_temperature": ccd_temperature,
+                    "image_ready": "on" if image_ready else "off",
+                    "readout_mode": readout_modes[readout_mode],
+                    "sensor_type": CAMERA_SENSOR_TYPES[sensor_type],
                 }
-                if device.cangetcoolerpower():
-                    state["cooler_on"] = (device.cooleron(),)
-                    state["cooler_power"] = (device.coolerpower(),)
-
-                if device.component_options.get("image", False):
-                    try:
-                        state["last_exposure_duration"] = (device.lastexposureduration(),)
-                        state["last_exposure_start_time"] = (device.lastexposurestarttime(),)
-                    except AlpacaError:
-                        _LOGGER.warning(
-                            "%s: Call to LastExposureDuration before the first image has been taken!",
-                            sys_id,
-                        )
-                    except AttributeError:
-                        pass
-                    except (RequestConnectionError, DeviceResponseError):
-                        pass
-
-                    try:
-                        state["percent_completed"] = (device.percentcompleted(),)
-                    except AlpacaError:
-                        _LOGGER.warning(
-                            "%s: Call to LastExposureDuration before the first image has been taken!",
-                            sys_id,
-                        )
-                    except AttributeError:
-                        pass
-                    except (RequestConnectionError, DeviceResponseError):
-                        pass
-
-                    if device.imageready():
+                if can_get_cooler_power:
+                    cooler_on, cooler_power = results[4:required]
+                    state["cooler_on"] = "on" if cooler_on else "off"
+                    state["cooler_power"] = cooler_power
+
+                if image:
+                    optional = zip(
+                        ("last_exposure_duration", "last_exposure_start_time", "percent_completed"),
+                        results[required:],
+                    )
+                    for key, result in optional:
+                        if isinstance(result, AlpacaError):
+                            _LOGGER.warning(
+                                "%s: Call to %s before the first image has been taken!",
+                                sys_id,
+                                key,
+                            )
+                        elif isinstance(result, (AttributeError, RequestConnectionError, DeviceResponseError)):
+                            pass
+                        elif isinstance(result, BaseException):
+                            raise result
+                        else:
+                            state[key] = result
+
+                    if image_ready:
                         _LOGGER.info("%s: Reading image", sys_id)
-                        image_data = device.imagearray()
-
-                        _LOGGER.debug("%s: Normalizing image", sys_id)
-                        normalized = await self.normalize_img(
-                            image_data,
-                            IMAGE_STRETCH_FUNCTION,
-                            IMAGE_MINMAX_PERCENT,
-                            IMAGE_MINMAX_VALUE,
-                            IMAGE_INVERT,
-                        )
-                        _LOGGER.debug("%s: Image dimensions " + str(normalized.shape), sys_id)
-
-                        _LOGGER.debug("%s: Scaling image", sys_id)
-                        normalized = await self.image_resize(normalized, width=1024)
-
-                        _LOGGER.debug("%s: Encoding image", sys_id)
-                        normalized_jpg = imencode(".jpg", normalized)[1]
-
-                        _LOGGER.info("%s: Publish image", sys_id)
-                        image_bytearray = bytearray(normalized_jpg)
-                        _LOGGER.debug("%s: Image size {len(image_bytearray)} bytes", sys_id)
-                        await self._publisher.publish_mqtt(topic + "screen", image_bytearray)
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
+                        image_data = device.imagearraybytes()
+                        screen = await self._process_image(sys_id, image_data)
+                await self._publish_online_state(_encode_json(state), screen)
             else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+                await self._publish_offline(sys_id)
         except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+            await self._publish_offline(sys_id)
             _LOGGER.error("%s: Not connected", sys_id)
             raise rcedre
 
@@ -517,30 +873,82 @@ class Camera(MqttConnector):
 class CameraFile(MqttConnector):
     """MQTT Device CameraFile"""
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the device state in an endless loop
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Modification time, subdirectories and latest FITS file per monitored directory
+        self._fits_dirs = {}
+
+    def _latest_fits_file(self, directory):
+        """Find the most recent FITS file below a directory.
+
+        Only directories whose modification time changed since the last call
+        are listed again, all others are served from the cache.
 
         Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-            interval (int): Update interval.
+            directory (string): The directory to search recursively.
+
+        Returns:
+            Path of the most recent FITS file or None.
         """
 
-        start = time.time()
-        while True:
+        latest = None
+        dirs = {}
+        pending = [directory]
+        while pending:
+            path = pending.pop()
+            if path in dirs:
+                continue
             try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_camera_file(sys_id, device, device_type, execution_time)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
+                mtime = os.stat(path).st_mtime_ns
+                cached = self._fits_dirs.get(path)
+                if cached is None or cached[0] != mtime:
+                    subdirs, files = [], []
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            if entry.name.startswith("."):
+                                continue
+                            if entry.is_dir():
+                                subdirs.append(entry.path)
+                            elif entry.name.endswith(".fits") and entry.is_file():
+                                files.append((entry.stat().st_ctime, entry.path))
+                    cached = (mtime, subdirs, max(files, default=None))
+            except OSError:
+                continue
+            dirs[path] = cached
+            pending.extend(cached[1])
+            if cached[2] is not None and (latest is None or cached[2] > latest):
+                latest = cached[2]
+        self._fits_dirs = dirs
+
+        return latest[1] if latest is not None else None
+
+    @staticmethod
+    def _read_fits_image(hdu):
+        """Read a decimated copy of the image of a memory mapped FITS HDU.
+
+        Only every n-th row and column is read from the file so that the
+        image is still at least twice the published width. Scaling by
+        BZERO and BSCALE is applied to the decimated pixels only.
+
+        Args:
+            hdu (PrimaryHDU): The HDU opened with do_not_scale_image_data.
+
+        Returns:
+            The image array in native byte order.
+        """
+
+        raw = hdu.data
+        step = max(1, raw.shape[-1] // (2 * IMAGE_PUBLISH_DIMENSIONS[0]))
+        data = raw[..., ::step, ::step].astype(raw.dtype.newbyteorder("="))
+        bscale = hdu.header.get("BSCALE", 1)
+        bzero = hdu.header.get("BZERO", 0)
+        if data.dtype.kind == "i" and bscale == 1 and bzero == -np.iinfo(data.dtype).min:
+            # Unsigned integers stored with an offset, flip the sign bit
+            unsigned = data.view(data.dtype.str.replace("i", "u"))
+            return np.bitwise_xor(unsigned, unsigned.dtype.type(bzero), out=unsigned)
+        if bscale != 1 or bzero != 0:
+            return data * np.float32(bscale) + np.float32(bzero)
+        return data
 
     """
     FITS Header example
@@ -573,7 +981,7 @@ class CameraFile(MqttConnector):
     END 
     """
 
-    async def _publish_camera_file(self, sys_id, device, device_type, execution_time):
+    async def _publish(self, sys_id, device, device_type, execution_time):
         """Publish image from file with FITS header data
 
         Args:
@@ -583,177 +991,131 @@ class CameraFile(MqttConnector):
             execution_time (int): Duration of the thread is running.
         """
 
-        sys_id_ = sys_id.replace(".", "_")
         monitor_directory = device.component_options.get("monitor", ".")
         _LOGGER.debug("%s: Update", sys_id)
 
-        latest_file = ""
-        try:
-            list_of_files = glob.glob(f"{monitor_directory}/**/*.fits", recursive=True)
-            latest_file = max(list_of_files, key=os.path.getctime)
-        except ValueError:
+        latest_file = self._latest_fits_file(monitor_directory)
+        if latest_file is None:
             _LOGGER.warning("%s: No file found", sys_id)
             return
 
-        # TODO:
-        # For currently unkown reasons, the first publish doesn't replicate
-        # to the broker until create_mqtt_config is run again afterwards.
-        # As a workaround for now, we alwas republish for the first 3 minutes
-        publish = False
-        if DEVICE_TYPE_CAMERA_FILE in self._store:
-            if "last_file" in self._store[DEVICE_TYPE_CAMERA_FILE]:
-                if self._store[DEVICE_TYPE_CAMERA_FILE]["last_file"] == latest_file:
-                    _LOGGER.debug("%s: Image {latest_file} already published", sys_id)
-                else:
-                    self._store[DEVICE_TYPE_CAMERA_FILE] = {"last_file": latest_file}
-                    publish = True
+        try:
+            file_key = (latest_file, os.stat(latest_file).st_mtime_ns)
+        except OSError:
+            _LOGGER.warning("%s: File %s vanished", sys_id, latest_file)
+            return
+
+        cached = self._store.get(DEVICE_TYPE_CAMERA_FILE)
+        if cached is not None and cached["file_key"] == file_key:
+            # TODO:
+            # For currently unkown reasons, the first publish doesn't replicate
+            # to the broker until create_mqtt_config is run again afterwards.
+            # As a workaround for now, we alwas republish for the first 3 minutes
+            if execution_time < CAMERA_FILE_REPUBLISH_TIME and cached["state"] is not None:
+                await self._publish_online_state(cached["state"], cached["screen"])
             else:
-                self._store[DEVICE_TYPE_CAMERA_FILE] = {"last_file": latest_file}
-                publish = True
-        else:
-            self._store[DEVICE_TYPE_CAMERA_FILE] = {"last_file": latest_file}
-            publish = True
-        if execution_time < 180:
-            publish = True
-
-        if publish:
-            _LOGGER.info("%s: Reading image %s", sys_id, latest_file)
-            hdr = None
-            image_data = None
-            try:
-                # , ignore_missing_simple=True
-                with fits.open(latest_file) as hdul:
-                    # hdul = fits.open(latest_file)
-                    hdr = hdul[0].header
-                    image_data = fits.getdata(latest_file, ext=0)
-            except OSError:
-                _LOGGER.error(
-                    "%s: No SIMPLE card found, this file does not appear to be a valid FITS file",
-                    sys_id,
-                )
-                return
+                _LOGGER.debug("%s: Image %s already published", sys_id, latest_file)
+            return
 
-            objctra_fits = hdul[0].header['OBJCTRA']
-            objctdec_fits = hdul[0].header['OBJCTDEC']
-            objct_coords = SkyCoord(objctra_fits, objctdec_fits, unit=(u.hour, u.deg))
+        # Invalid files are remembered as well, they are read again only when modified
+        self._store[DEVICE_TYPE_CAMERA_FILE] = {"file_key": file_key, "state": None, "screen": None}
 
-            topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
-            try:
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
-                state = {
-                    "image_type": hdr.get("IMAGETYP", "n/a"),
-                    "exposure_duration": round(hdr.get("EXPOSURE", 0), 3),
-                    "time_of_observation": datetime.fromisoformat(hdr.get("DATE-OBS", datetime.utcnow()))
-                    .replace(microsecond=0, tzinfo=timezone.utc)
-                    .isoformat(),
-                    "x_axis_binning": round(hdr.get("XBINNING", 0), 0),
-                    "y_axis_binning": round(hdr.get("YBINNING", 0), 0),
-                    "gain": round(hdr.get("GAIN", 0), 0),
-                    "offset": round(hdr.get("OFFSET", 0), 3),
-                    "pixel_x_axis_size": round(hdr.get("XPIXSZ", 0), 3),
-                    "pixel_y_axis_size": round(hdr.get("YPIXSZ", 0), 3),
-                    "imaging_instrument": hdr.get("INSTRUME", "n/a"),
-                    "ccd_temperature": round(hdr.get("CCD-TEMP", 0), 3),
-                    "filter": hdr.get("FILTER", "n/a"),
-                    "sensor_readout_mode": hdr.get("READOUTM", "n/a"),
-                    "sensor_bayer_pattern": hdr.get("BAYERPAT", "n/a"),
-                    "telescope": hdr.get("TELESCOP", "n/a"),
-                    "focal_length": round(hdr.get("FOCALLEN", 0), 3),
-                    "ra_of_telescope": round(hdr.get("RA", 0), 3),
-                    "declination_of_telescope": round(hdr.get("DEC", 0), 3),
-                    "altitude_of_telescope": round(hdr.get("CENTALT", 0), 3),
-                    "azimuth_of_telescope": round(hdr.get("CENTAZ", 0), 3),
-                    "object_of_interest": hdr.get("OBJECT", "n/a"),
-                    "ra_of_imaged_object": objct_coords.ra.degree,
-                    "declination_of_imaged_object": objct_coords.dec.degree,
-                    "rotation_of_imaged_object": round(hdr.get("OBJCTROT", 0), 3),
-                    "software": hdr.get("SWCREATE", "n/a"),
-                }
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
-
-                _LOGGER.debug("%s: Normalizing image", sys_id)
-                normalized = await self.normalize_img(
-                    image_data,
-                    IMAGE_STRETCH_FUNCTION,
-                    IMAGE_MINMAX_PERCENT,
-                    IMAGE_MINMAX_VALUE,
-                    IMAGE_INVERT,
-                )
-                _LOGGER.debug("%s: Image dimensions " + str(normalized.shape), sys_id)
+        # astropy is slow to import and only used by this device, load it on first use
+        from astropy import units as u
+        from astropy.coordinates import SkyCoord
+        from astropy.io import fits
 
-                _LOGGER.debug("%s: Scaling image", sys_id)
-                normalized = await self.image_resize(normalized, width=1024)
+        _LOGGER.info("%s: Reading image %s", sys_id, latest_file)
+        hdr = None
+        image_data = None
+        try:
+            # , ignore_missing_simple=True
+            with fits.open(latest_file, memmap=True, do_not_scale_image_data=True) as hdul:
+                hdr = hdul[0].header
+                image_data = self._read_fits_image(hdul[0])
+        except OSError:
+            _LOGGER.error(
+                "%s: No SIMPLE card found, this file does not appear to be a valid FITS file",
+                sys_id,
+            )
+            return
 
-                _LOGGER.debug("%s: Encoding image", sys_id)
-                normalized_jpg = imencode(".jpg", normalized)[1]
+        # Plain dict lookups instead of the case insensitive searches of the FITS header
+        header = dict(hdr.items())
+        date_obs = header.get("DATE-OBS")
+        time_of_observation = datetime.fromisoformat(date_obs) if date_obs else datetime.now(timezone.utc)
+        objct_coords = None
+        if "OBJCTRA" in header and "OBJCTDEC" in header:
+            objct_coords = SkyCoord(header["OBJCTRA"], header["OBJCTDEC"], unit=(u.hour, u.deg))
 
-                _LOGGER.info("%s: Publish image", sys_id)
-                image_bytearray = bytearray(normalized_jpg)
-                _LOGGER.debug("%s: Image size {len(image_bytearray)} bytes", sys_id)
-                await self._publisher.publish_mqtt(topic + "screen", image_bytearray)
-            except (RequestConnectionError, DeviceResponseError) as rcedre:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-                _LOGGER.error("%s: Not connected", sys_id)
-                raise rcedre
-            except Exception as exc:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-                _LOGGER.error(exc)
-                raise exc
+        try:
+            state = {
+                "image_type": header.get("IMAGETYP", "n/a"),
+                "exposure_duration": round(header.get("EXPOSURE", 0), 3),
+                "time_of_observation": time_of_observation.replace(microsecond=0, tzinfo=timezone.utc).isoformat(),
+                "x_axis_binning": round(header.get("XBINNING", 0), 0),
+                "y_axis_binning": round(header.get("YBINNING", 0), 0),
+                "gain": round(header.get("GAIN", 0), 0),
+                "offset": round(header.get("OFFSET", 0), 3),
+                "pixel_x_axis_size": round(header.get("XPIXSZ", 0), 3),
+                "pixel_y_axis_size": round(header.get("YPIXSZ", 0), 3),
+                "imaging_instrument": header.get("INSTRUME", "n/a"),
+                "ccd_temperature": round(header.get("CCD-TEMP", 0), 3),
+                "filter": header.get("FILTER", "n/a"),
+                "sensor_readout_mode": header.get("READOUTM", "n/a"),
+                "sensor_bayer_pattern": header.get("BAYERPAT", "n/a"),
+                "telescope": header.get("TELESCOP", "n/a"),
+                "focal_length": round(header.get("FOCALLEN", 0), 3),
+                "ra_of_telescope": round(header.get("RA", 0), 3),
+                "declination_of_telescope": round(header.get("DEC", 0), 3),
+                "altitude_of_telescope": round(header.get("CENTALT", 0), 3),
+                "azimuth_of_telescope": round(header.get("CENTAZ", 0), 3),
+                "object_of_interest": header.get("OBJECT", "n/a"),
+                "ra_of_imaged_object": objct_coords.ra.degree if objct_coords is not None else None,
+                "declination_of_imaged_object": objct_coords.dec.degree if objct_coords is not None else None,
+                "rotation_of_imaged_object": round(header.get("OBJCTROT", 0), 3),
+                "software": header.get("SWCREATE", "n/a"),
+            }
+            payload = _encode_json(state)
+            screen = await self._process_image(sys_id, image_data)
+            self._store[DEVICE_TYPE_CAMERA_FILE].update(state=payload, screen=screen)
+            await self._publish_online_state(payload, screen)
+        except (RequestConnectionError, DeviceResponseError) as rcedre:
+            await self._publish_offline(sys_id)
+            _LOGGER.error("%s: Not connected", sys_id)
+            raise rcedre
+        except Exception as exc:
+            await self._publish_offline(sys_id)
+            _LOGGER.error(exc)
+            raise exc
 
 
 class Focuser(MqttConnector):
     """MQTT Device Focuser"""
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the device state in an endless loop
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-            interval (int): Update interval.
-        """
-
-        start = time.time()
-        while True:
-            try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_focuser(sys_id, device, device_type)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
-
-    async def _publish_focuser(self, sys_id, device, device_type):
+    async def _publish(self, sys_id, device, device_type, execution_time):
         """Publish the focuser state
 
         Args:
             sys_id (string): ID of the device.
             device (Device): The device.
             device_type (string): Type of the device.
+            execution_time (int): Duration of the thread is running.
         """
 
-        sys_id_ = sys_id.replace(".", "_")
-
         _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
         try:
-            if device.connected():
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
+            if self._is_connected(device):
+                position, is_moving = await self._gather_calls([device.position, device.ismoving])
                 state = {
-                    "position": device.position(),
-                    "is_moving": "on" if device.ismoving() else "off",
+                    "position": position,
+                    "is_moving": "on" if is_moving else "off",
                 }
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
+                await self._publish_state(sys_id, state)
             else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+                await self._publish_offline(sys_id)
         except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+            await self._publish_offline(sys_id)
             _LOGGER.error("%s: Not connected", sys_id)
             raise rcedre
 
@@ -761,65 +1123,45 @@ class Focuser(MqttConnector):
 class Switch(MqttConnector):
     """MQTT Device Switch"""
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the switch state in an endless loop
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-            interval (int): Update interval.
-        """
-
-        start = time.time()
-        while True:
-            try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_switch(sys_id, device, device_type)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
-
-    async def _publish_switch(self, sys_id, device, device_type):
+    async def _publish(self, sys_id, device, device_type, execution_time):
         """Publish the device state
 
         Args:
             sys_id (string): ID of the device.
             device (Device): The device.
             device_type (string): Type of the device.
+            execution_time (int): Duration of the thread is running.
         """
 
-        sys_id_ = sys_id.replace(".", "_")
-
         _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
         try:
-            if device.connected():
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
+            if self._is_connected(device):
                 max_switch = device.maxswitch()
                 state = {"max_switch": max_switch}
-                for switch_id in range(0, max_switch):
-                    try:
-                        state["switch_" + str(switch_id)] = "on" if device.getswitch(switch_id) else "off"
-                        state["switch_value_" + str(switch_id)] = device.getswitchvalue(switch_id)
-                    except AttributeError:  # c is not a Device (so lacks those methods)
-                        pass
-                    except (
-                        RequestConnectionError,
-                        DeviceResponseError,
-                    ):  # connection to telescope failed
-                        pass
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
+                # Each switch is read as its state followed by its value
+                calls = [
+                    (key, call)
+                    for switch_id in range(max_switch)
+                    for key, call in (
+                        (f"switch_{switch_id}", partial(device.getswitch, switch_id)),
+                        (f"switch_value_{switch_id}", partial(device.getswitchvalue, switch_id)),
+                    )
+                ]
+                results = await self._gather_calls([call for _, call in calls], return_exceptions=True)
+                for index, ((key, _), value) in enumerate(zip(calls, results)):
+                    # Skip switches which are not readable or whose connection failed
+                    if isinstance(value, (AttributeError, RequestConnectionError, DeviceResponseError)):
+                        continue
+                    if isinstance(value, BaseException):
+                        raise value
+                    if index % 2 == 0:
+                        value = "on" if value else "off"
+                    state[key] = value
+                await self._publish_state(sys_id, state)
             else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+                await self._publish_offline(sys_id)
         except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+            await self._publish_offline(sys_id)
             _LOGGER.error("%s: Not connected", sys_id)
             raise rcedre
 
@@ -827,57 +1169,35 @@ class Switch(MqttConnector):
 class FilterWheel(MqttConnector):
     """MQTT Device FilterWheel"""
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the device state in an endless loop
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-            interval (int): Update interval.
-        """
-
-        start = time.time()
-        while True:
-            try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_filterwheel(sys_id, device, device_type)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
-
-    async def _publish_filterwheel(self, sys_id, device, device_type):
+    async def _publish(self, sys_id, device, device_type, execution_time):
         """Publish the filterwheel state
 
         Args:
             sys_id (string): ID of the device.
             device (Device): The device.
             device_type (string): Type of the device.
+            execution_time (int): Duration of the thread is running.
         """
 
-        sys_id_ = sys_id.replace(".", "_")
-
         _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
         try:
-            if device.connected() and len(device.names()) > 0:
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
+            names, position = [], None
+            if self._is_connected(device):
+                # The filter names are cached by the device, only the position is read on every update
+                names = device.names()
+                (position,) = await self._gather_calls([device.position])
+            if len(names) > 0:
                 state = {
-                    "position": device.position(),
-                    "names": device.names(),
-                    "current": device.names()[device.position()],
+                    "position": position,
+                    "names": names,
+                    # The position is -1 while the wheel is moving
+                    "current": names[position] if 0 <= position < len(names) else None,
                 }
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
+                await self._publish_state(sys_id, state)
             else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+                await self._publish_offline(sys_id)
         except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
+            await self._publish_offline(sys_id)
             _LOGGER.error("%s: Not connected", sys_id)
             raise rcedre
 
@@ -885,174 +1205,28 @@ class FilterWheel(MqttConnector):
 class Dome(MqttConnector):
     """MQTT Device Dome"""
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the device state in an endless loop
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-            interval (int): Update interval.
-        """
-
-        start = time.time()
-        while True:
-            try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_dome(sys_id, device, device_type)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
-
-    async def _publish_dome(self, sys_id, device, device_type):
-        """Publish the dome state
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-        """
-
-        sys_id_ = sys_id.replace(".", "_")
-
-        _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
-        try:
-            if device.connected():
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
-                state = {
-                    "altitude": device.altitude(),
-                    "athome": device.athome(),
-                    "atpark": device.atpark(),
-                    "azimuth": device.azimuth(),
-                    "shutterstatus": device.shutterstatus(),
-                }
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
-            else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-        except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-            _LOGGER.error("%s: Not connected", sys_id)
-            raise rcedre
+    FIELDS = (
+        ("altitude", "altitude"),
+        ("athome", "athome"),
+        ("atpark", "atpark"),
+        ("azimuth", "azimuth"),
+        ("shutterstatus", "shutterstatus"),
+    )
 
 
 class Rotator(MqttConnector):
     """MQTT Device Rotator"""
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the device state in an endless loop
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-            interval (int): Update interval.
-        """
-
-        start = time.time()
-        while True:
-            try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_rotator(sys_id, device, device_type)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
-
-    async def _publish_rotator(self, sys_id, device, device_type):
-        """Publish the rotator state
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-        """
-
-        sys_id_ = sys_id.replace(".", "_")
-
-        _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
-        try:
-            if device.connected():
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
-                state = {
-                    "mechanicalposition": device.mechanicalposition(),
-                    "position": device.position(),
-                }
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
-            else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-        except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-            _LOGGER.error("%s: Not connected", sys_id)
-            raise rcedre
+    FIELDS = (
+        ("mechanicalposition", "mechanicalposition"),
+        ("position", "position"),
+    )
 
 
 class SafetyMonitor(MqttConnector):
     """MQTT Device SafetyMonitor"""
 
-    async def publish_loop(self, sys_id, device, device_type, interval):
-        """Publish the device state in an endless loop
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-            interval (int): Update interval.
-        """
-
-        start = time.time()
-        while True:
-            try:
-                execution_time = round(time.time() - start, 1)
-                _LOGGER.debug("Execution time for %s %ds", sys_id, execution_time)
-                await self._publish_safetymonitor(sys_id, device, device_type)
-                sleep(interval)
-            except KeyboardInterrupt:
-                break
-            except (RequestConnectionError, DeviceResponseError):
-                _LOGGER.error("Stopping thread for %s", sys_id)
-                break
-        _LOGGER.warning("Thread %s exits", sys_id)
-        sys.exit(0)
-
-    async def _publish_safetymonitor(self, sys_id, device, device_type):
-        """Publish the safetymonitor state
-
-        Args:
-            sys_id (string): ID of the device.
-            device (Device): The device.
-            device_type (string): Type of the device.
-        """
-
-        sys_id_ = sys_id.replace(".", "_")
-
-        _LOGGER.debug("%s: Update", sys_id)
-        topic = "astrolive/" + device_type + "/" + sys_id_ + "/"
-        try:
-            if device.connected():
-                await self._publisher.publish_mqtt(topic + "lwt", "ON")
-                state = {
-                    "issafe": device.issafe(),
-                }
-                await self._publisher.publish_mqtt(topic + "state", json.dumps(state))
-            else:
-                await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-        except (RequestConnectionError, DeviceResponseError) as rcedre:
-            await self._publisher.publish_mqtt(topic + "lwt", "OFF")
-            _LOGGER.error("%s: Not connected", sys_id)
-            raise rcedre
+    FIELDS = (("issafe", "issafe"),)
 
 
 _connector_classes = {
@@ -1,11 +1,13 @@
 """Handler for MQTT communication"""
+import asyncio
 import json
 import logging
 import queue
-import random
+import secrets
+import socket
 import ssl
-import string
-from time import sleep
+import threading
+import weakref
 from typing import Callable, Iterable, Tuple
 
 import paho.mqtt.client as mqtt
@@ -13,6 +15,9 @@ import paho.mqtt.client as mqtt
 from .observatory import Component
 
 from .const import (
+    MQTT_COMMAND_QOS,
+    MQTT_CONNECT_WAIT,
+    MQTT_MAX_BATCH,
     STATE_ON,
     STATE_OFF,
 )
@@ -38,14 +43,19 @@ class Connector:
     def on_connect(self, client, userdata, flags, rc, properties):
         """Connected to MQTT"""
 
-        if flags.get("session_present"):
+        if flags.session_present:
             _LOGGER.debug("MQTT session present")
 
         if rc == 0:
             _LOGGER.debug("MQTT success connect")
+            # Send the small state messages right away instead of waiting for Nagle's algorithm
+            sock = client.socket()
+            if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             client.publish(
                 "astrolive/lwt",
-                "ON",
+                b"ON",
+                retain=True,
             )
         else:
             _LOGGER.debug("MQTT success not successful")
@@ -55,7 +65,8 @@ class Connector:
 
         client.publish(
             "astrolive/lwt",
-            "OFF",
+            b"OFF",
+            retain=True,
         )
 
     def get(self, component: "Component", variable: str, **data):
@@ -86,30 +97,46 @@ class MqttHandler(Connector):
         options = args[0]
         self._publisher = kwargs["publisher"]
         self._client = None
-        unique_id = "".join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(12))
+        # Set by the paho network thread while the broker is connected
+        self._connected = threading.Event()
+        # Command topics, subscribed again after every reconnect
+        self._subscriptions = {"astrolive/command"}
+        # Device connectors publishing through this handler, told about every (re)connect
+        self._device_connectors = weakref.WeakSet()
+        unique_id = secrets.token_hex(6).upper()
         if self._publisher is None:
             proto = mqtt.MQTTv5
-            self._client = mqtt.Client(client_id=f"{options['mqtt']['client']}-{unique_id}", protocol=proto)
+            # A local broker can be reached via its unix domain socket instead of TCP
+            socket_path = options["mqtt"].get("socket_path")
+            transport = "unix" if socket_path else "tcp"
+            self._client = mqtt.Client(
+                mqtt.CallbackAPIVersion.VERSION2,
+                client_id=f"{options['mqtt']['client']}-{unique_id}", protocol=proto, transport=transport
+            )
             self._client.on_message = self.on_message
             self._client.on_log = self.on_log
             self._client.on_connect = self.on_connect
             self._client.on_disconnect = self.on_disconnect
-            self._client.will_set("astrolive/lwt", payload="OFF")
+            self._client.will_set("astrolive/lwt", payload=b"OFF", retain=True)
 
             if options["mqtt"]["tls"]["enabled"] is True:
-                self._client.tls_set(
-                    options["mqtt"]["tls"]["ca"],
-                    tls_version=ssl.PROTOCOL_TLSv1_2,
-                )
+                # Negotiates TLS 1.3 if the broker supports it, TLS 1.2 at least
+                context = ssl.create_default_context(cafile=options["mqtt"]["tls"]["ca"])
+                context.minimum_version = ssl.TLSVersion.TLSv1_2
+                self._client.tls_set_context(context)
                 self._client.tls_insecure_set(options["mqtt"]["tls"]["insecure"])
 
             if options["mqtt"]["username"] != "":
                 _LOGGER.info("MQTT Connector using username password")
                 self._client.username_pw_set(options["mqtt"]["username"], options["mqtt"]["password"])
 
-            self._client.connect(options["mqtt"]["broker"], options["mqtt"]["port"])
+            if socket_path:
+                _LOGGER.info("MQTT Connector using unix socket %s", socket_path)
+                self._client.connect(socket_path)
+            else:
+                self._client.connect(options["mqtt"]["broker"], options["mqtt"]["port"])
+            # The network thread reconnects to the broker on its own
             self._client.loop_start()
-            self._client.subscribe("astrolive/command")
 
             _LOGGER.info(
                 "MQTT Connector created, ClientId=%s-%s",
@@ -127,6 +154,34 @@ class MqttHandler(Connector):
     def connect(self, *args, **kwargs):
         """Connect"""
 
+    def on_connect(self, client, userdata, flags, rc, properties):
+        """Connected to MQTT, restore the subscriptions"""
+
+        super().on_connect(client, userdata, flags, rc, properties)
+        if rc == 0:
+            for topic in list(self._subscriptions):
+                client.subscribe(topic, qos=MQTT_COMMAND_QOS)
+            # A restarted broker may have lost the retained online status and states
+            for connector in list(self._device_connectors):
+                connector.reset_published()
+            self._connected.set()
+
+    def add_device_connector(self, connector):
+        """Register a device connector which publishes through this handler
+
+        Args:
+            connector (MqttConnector): The device connector, held by a weak reference.
+        """
+
+        self._device_connectors.add(connector)
+
+    def on_disconnect(self, client, userdata, flags, rc, properties):
+        """Disconnected from MQTT"""
+
+        self._connected.clear()
+        _LOGGER.warning("MQTT Broker disconnected: %s", rc)
+        super().on_disconnect(client, userdata, flags, rc, properties)
+
     def configure_components(self):
         """Configure Components"""
 
@@ -145,22 +200,23 @@ class MqttHandler(Connector):
         command = {}
         if payload in (STATE_ON, STATE_OFF):
             # Are we switching a switch?
-            if "astrolive/switch/" in topic:
+            # dissecting astrolive/switch/obs_telescope_switch/set_switch_X
+            parts = topic.split("/")
+            if len(parts) == 4 and parts[0] == "astrolive" and parts[1] == "switch":
                 _LOGGER.info("On/Off command for a switch")
-                # dissecting astrolive/switch/obs_telescope_switch/set_switch_X
-                command["component"] = topic.split("/")[2].replace("_", ".")
-                command["id"] = topic.split("/")[3].split("_")[-1]
+                command["component"] = parts[2].replace("_", ".")
+                command["id"] = parts[3].rpartition("_")[2]
                 command["command"] = payload
         else:
             # Any other command
             try:
-                command = json.loads(message.payload.decode("utf-8"))
+                command = json.loads(payload)
             except json.decoder.JSONDecodeError as jsonde:
                 fail_command = True
-                _LOGGER.error(message.payload.decode("utf-8"))
+                _LOGGER.error("%s", payload)
                 _LOGGER.error("%s", jsonde.msg)
                 # return None
-        _LOGGER.debug(message.payload.decode("utf-8"))
+        _LOGGER.debug("%s", payload)
 
         # Test for keys
         if "component" not in command:
@@ -206,125 +262,98 @@ class MqttHandler(Connector):
     async def publish_mqtt(self, topic, message, qos=0, retain=False):
         """Queue a MQTT message
 
+        The looper hands the message to paho without waiting for an
+        acknowledgement, device states are sent with QoS 0.
+
         Args:
             topic (string): Topic of the message.
-            message (string): The message.
+            message (bytes): The message, strings are encoded to UTF-8 here.
+            qos (int): Optional. Quality of service level.
+            retain (bool): Optional. Retain the message on the broker.
+        """
+
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        self._messages.put([[topic, message, qos, retain]])
+
+    async def publish_mqtt_many(self, messages):
+        """Queue multiple MQTT messages to be sent in one go
+
+        Args:
+            messages (list): Tuples of topic, message as bytes and optionally qos and retain.
         """
 
-        self._messages.put([topic, message, qos, retain])
+        self._messages.put([[*message, 0, False][:4] for message in messages])
 
     async def subsribe_mqtt(self, topic):
-        """Subscribe to a MQTT topic
+        """Subscribe to a MQTT command topic
 
         Args:
             topic (string): Topic of the message.
         """
 
-        self._client.subscribe(topic)
+        self._subscriptions.add(topic)
+        if self._connected.is_set():
+            self._client.subscribe(topic, qos=MQTT_COMMAND_QOS)
 
     async def looper(self):
-        """Send a MQTT message one by one"""
+        """Send the MQTT messages as soon as they are queued"""
 
+        # Messages kept while the broker is away, sent once it is back
+        held = []
         while True:
-            if self._client.is_connected is False:
-                _LOGGER.warning("Reconnecting to MQTT Broker")
-                self._client.reconnect()
-
-            # if len(self._messages) > 0:
-            if not self._messages.empty():
-                message = self._messages.get()
-                if message:
-                    response = self._client.publish(message[0], message[1], message[2], message[3])
-                    _LOGGER.debug(
-                        "MQTT publish ratain: %s, %s, %s",
-                        message[0],
-                        message[2],
-                        message[3],
-                    )
-                    if response[0]:
-                        _LOGGER.warning("MQTT failure: %s", response[0])
-            sleep(0.1)
-
-
-class MqttListener(Connector):
-    """Specialized MQTT Connector"""
-
-    def __init__(self, *args, **kwargs) -> None:
-        options = args[0]
-        self._listener = kwargs["listener"]
-        self._client = None
-        unique_id = "".join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(12))
-        if self._listener is None:
-            proto = mqtt.MQTTv311
-            self._client = mqtt.Client(f"{options['mqtt']['client']}-{unique_id}", proto)
-            self._client.on_message = self.on_message
-            self._client.on_log = self.on_log
-            self._client.on_connect = self.on_connect
-            self._client.on_disconnect = self.on_disconnect
-            self._client.will_set("astrolive/lwt", payload="OFF")
-
-            if options["mqtt"]["tls"]["enabled"] is True:
-                self._client.tls_set(
-                    options["mqtt"]["tls"]["ca"],
-                    tls_version=ssl.PROTOCOL_TLSv1_2,
+            # Wake up once a second, so that the worker thread never blocks the shutdown
+            try:
+                messages = await asyncio.to_thread(self._messages.get, timeout=1.0)
+            except queue.Empty:
+                if not held:
+                    continue
+                messages = []
+
+            # Everything else already waiting is published in the same run
+            for _ in range(MQTT_MAX_BATCH - 1):
+                try:
+                    messages += self._messages.get_nowait()
+                except queue.Empty:
+                    break
+            if held:
+                messages = held + messages
+                held = []
+
+            # paho reconnects in the background, retained discovery configs and
+            # online states must survive the outage, so nothing is dropped
+            if not await asyncio.to_thread(self._connected.wait, MQTT_CONNECT_WAIT):
+                held = self._latest_per_topic(messages)
+                _LOGGER.warning("MQTT Broker not connected, holding %s messages", len(held))
+                continue
+
+            for message in messages:
+                response = self._client.publish(message[0], message[1], message[2], message[3])
+                _LOGGER.debug(
+                    "MQTT publish ratain: %s, %s, %s",
+                    message[0],
+                    message[2],
+                    message[3],
                 )
-                self._client.tls_insecure_set(options["mqtt"]["tls"]["insecure"])
-
-            if options["mqtt"]["username"] != "":
-                _LOGGER.info("MQTT Connector using username password")
-                self._client.username_pw_set(options["mqtt"]["username"], options["mqtt"]["password"])
-
-            self._client.connect(options["mqtt"]["broker"], options["mqtt"]["port"])
-            _LOGGER.info("Listener loop_start")
-            self._client.loop_start()  # start the loop
-            self._client.subscribe("astrolive/command")
-            _LOGGER.info(
-                "MQTT Connector created, ClientId=%s-%s",
-                options["mqtt"]["client"],
-                unique_id,
-            )
-        else:
-            _LOGGER.info("MQTT Connector already exists")
-
-        self._messages = []
-
-        super().__init__()
+                if response[0]:
+                    _LOGGER.warning("MQTT failure: %s", response[0])
 
-    def connect(self, *args, **kwargs):
-        """Connect"""
-
-    def configure_components(self):
-        """Configure Components"""
-
-    def on_message(self, client, userdata, message):
-        """Called when we receive a command to process"""
-
-    async def publish_mqtt(self, topic, message):
-        """Queue a MQTT message
+    @staticmethod
+    def _latest_per_topic(messages):
+        """Keep only the latest message of each topic, in the order they were last queued
 
         Args:
-            topic (string): Topic of the message.
-            message (string): The message.
-        """
+            messages (list): Lists of topic, message, qos and retain.
 
-        self._messages.append([topic, message])
-
-    async def looper(self):
-        """Send a MQTT message one by one"""
+        Returns:
+            The remaining messages.
+        """
 
-        while True:
-            if self._client.is_connected is False:
-                _LOGGER.warning("Reconnecting to MQTT Broker")
-                self._client.reconnect()
-
-            if self._messages:
-                _LOGGER.debug("Queue length: %d", len(self._messages))
-                message = self._messages.pop(0)
-                if message:
-                    response = self._client.publish(message[0], message[1])
-                    if response[0]:
-                        _LOGGER.warning("MQTT failure: %s", response[0])
-            sleep(0.1)
+        latest = {}
+        for message in messages:
+            latest.pop(message[0], None)
+            latest[message[0]] = message
+        return list(latest.values())
 
 
 _connector_classes = {
@@ -1,108 +1,154 @@
+import json
 import logging
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import List, MutableMapping, Optional, Union
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional, Union
+
+import numpy as np
+from urllib3.exceptions import ProtocolError
 
 from .config import Config
 from .connectors import Connector
+from .const import ALPACA_POOL_SIZE, DEVICE_GET_TTL, DEVICE_POLL_INTERVAL, DEVICE_STATE_TTL, SENSOR_TYPE_RGGB
 from .coo import check_equatorial_coordinates, check_horizontal_coordinates
+from .errors import AlpacaError, AlpacaHttpError, DeviceResponseError, RequestConnectionError
 
 logger = logging.getLogger(__name__)
 
+# Marks options which are not set, None is a valid option value
+_MISSING = object()
+
+# Immutable GET results which Device._get reuses for a short time
+_SCALAR_TYPES = (bool, int, float, str, type(None))
+
+# Right ascension is sent in hours, the API uses degrees
+_HOURS_TO_DEG = 360.0 / 24.0
+_DEG_TO_HOURS = 24.0 / 360.0
+
+# Runs the requests of Device.batch_get and Device.run_nowait side by side on the connector session
+_BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=ALPACA_POOL_SIZE, thread_name_prefix="alpaca")
+
 
 class Component:
     """Base class for all elements of device tree"""
 
+    __slots__ = (
+        "kind",
+        "sys_id",
+        "parent",
+        "component_options",
+        "_connector",
+        "_resolved_connector",
+        "children",
+        "_root",
+        "_option_cache",
+        "_components",
+    )
+
     def __init__(self, sys_id: str, parent: Union["Component", None]) -> None:
         self.kind = type(self).__name__.lower()
-        self.sys_id: str = sys_id
+        # Interned, lookups in the component index compare by identity first
+        self.sys_id: str = sys.intern(sys_id)
         self.parent: Component = parent
         self.component_options = {}
         self._connector: Optional[Connector] = None
+        # Own connector or the one inherited from the parent, resolved in _setup
+        self._resolved_connector: Optional[Connector] = None
         self.children: dict[str, Component] = {}
+        # The tree is built top down, so the parent already knows its root
+        self._root: Component = self if parent is None else parent.root
+        self._option_cache = {}
+        # All components of the tree by absolute sys_id, kept by the root
+        self._components: dict[str, Component] = {}
+        self._root._components[self.sys_id] = self
 
     def _setup(self, options: dict):
-        self.component_options: MutableMapping = options.copy()
-        try:
-            self._connector = Connector.create_connector(self.component_options["protocol"])
-        except KeyError:
-            pass
-        try:
-            child_options = self.component_options.pop("components")
-        except KeyError:
-            child_options = {}
+        # Read-only view on the configuration instead of a copy per component
+        self.component_options: Mapping = MappingProxyType(options)
+        self._option_cache = {}
+        if self.parent is None:
+            self._components = {self.sys_id: self}
+        protocol = self.component_options.get("protocol")
+        if protocol is not None:
+            self._connector = Connector.create_connector(protocol)
+        if self._connector is not None:
+            self._resolved_connector = self._connector
+        elif self.parent is not None:
+            self._resolved_connector = self.parent.connector
+        child_options = options.get("components", {})
         for cid, op in child_options.items():
             child = self._create_component(kind=op["kind"], sys_id=self.sys_id + "." + cid, parent=self)
             self.children[cid] = child
-            setattr(self, cid, child)  # allow easy navigation: `parent.child`
             child._setup(op)
 
+    def __getattr__(self, name: str):
+        """Access to children as members, allows easy navigation: `parent.child`"""
+        if name != "children":
+            try:
+                return self.children[name]
+            except KeyError:
+                pass
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
     @property
     def connector(self) -> Connector:
-        if self._connector is not None:
-            return self._connector
-        else:
-            return self.parent.connector
+        return self._resolved_connector
 
     def get_option_recursive(self, option):
-        try:
-            return self.component_options[option]
-        except KeyError:
-            if self.parent is None:
-                return None
-            else:
-                return self.parent.get_option_recursive(option)
+        value = self._option_cache.get(option, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self.component_options.get(option, _MISSING)
+        if value is _MISSING:
+            value = None if self.parent is None else self.parent.get_option_recursive(option)
+        self._option_cache[option] = value
+        return value
 
     def children_tree_iter(self):
         """Generator yielding components tree, starting from self"""
-        yield self
-        for c in self.children.values():
-            yield from c.children_tree_iter()
+        stack = [self]
+        while stack:
+            c = stack.pop()
+            yield c
+            # Reversed, so that children are yielded in insertion order
+            stack.extend(reversed(c.children.values()))
 
     def children_count(self, recursively=True):
         """gets number of children"""
-        n = len(self.children)
-        if recursively:
-            for c in self.children.values():
-                n += c.children_count(recursively=True)
-        return n
+        if not recursively:
+            return len(self.children)
+        return sum(1 for _ in self.children_tree_iter()) - 1
 
     def child_by_relative_sys_id(self, sys_id_rel: str):
         """Find child by relative sys_id path"""
-        cid, *cpath = sys_id_rel.split(".", 1)
-        c = self.children[cid]
-        if cpath:
-            return c.child_by_relative_sys_id(cpath[0])
-        else:
-            return c
+        c = self
+        for cid in sys_id_rel.split("."):
+            c = c.children[cid]
+        return c
 
     def component_by_absolute_sys_id(self, sys_id_abs: str):
-        cid, *cpath = sys_id_abs.split(".", 1)
         root = self.root
-        if root.sys_id != cid:
+        if root.sys_id != sys_id_abs.partition(".")[0]:
             raise IndexError("Absolute sys_id should start from root: %s", root.sys_id)
-        if cpath:
-            return root.child_by_relative_sys_id(cpath[0])
-        else:
-            return self
+        try:
+            return root._components[sys_id_abs]
+        except KeyError as exc:
+            raise IndexError("No component with sys_id: %s", sys_id_abs) from exc
 
     @property
     def root(self):
-        if self.parent is not None:
-            return self.parent.root
-        else:
-            return self
+        return self._root
 
     @classmethod
     def _create_component(cls, kind: str, sys_id: str, parent: "Component") -> "Component":
         return _component_classes[kind](sys_id=sys_id, parent=parent)
 
-    # def __getattribute__(self, name: str) -> Any:
-    #     """Access to children as another members"""
-    #     try:
-    #         return super().__getattribute__(name)
-    #     except AttributeError:
-    #         return self.children.get(name)
-
     # @classmethod
     # def class_name(cls):
     #     return cls.__name__
@@ -122,6 +168,8 @@ class Observatory(Component):
             Later overwrites former
     """
 
+    __slots__ = ("config", "options", "preset")
+
     def __init__(self, configuration: Optional[Config] = None):
         if configuration is None:
             configuration = Config.global_instance()
@@ -142,9 +190,6 @@ class Observatory(Component):
         self.options = self.config.data[preset]["observatory"]
         self._setup(self.options)
 
-    def options(self):
-        return self.options
-
 
 class Device(Component):
     """Common methods across all devices.
@@ -159,19 +204,314 @@ class Device(Component):
     READ_TIME = 2
     MODIFY_TIME = 3
 
+    # Capabilities and descriptions which do not change while the device is connected
+    __slots__ = ("_constants", "_recent", "_puts", "_state", "_has_devicestate", "_inflight", "_inflight_lock")
+
+    # Cached attributes which depend on a writable setting, dropped when it is written
+    _SENSOR_SETTING_DEPENDENTS = ("electronsperadu", "exposuremax", "exposuremin", "fullwellcapacity")
+    INVALIDATED_BY_PUT: Mapping[str, tuple] = MappingProxyType(
+        {
+            "binx": _SENSOR_SETTING_DEPENDENTS,
+            "biny": _SENSOR_SETTING_DEPENDENTS,
+            "gain": _SENSOR_SETTING_DEPENDENTS,
+            "readoutmode": _SENSOR_SETTING_DEPENDENTS,
+            "setswitchname": ("getswitchname",),
+        }
+    )
+
+    # First interface version with the devicestate property, ITelescopeV4 and the like override it
+    DEVICESTATE_INTERFACE_VERSION = 3
+
+    # Seconds a GET result is reused by attribute, others use DEVICE_GET_TTL
+    GET_TTL: Mapping[str, float] = MappingProxyType({})
+
+    CONSTANT_ATTRIBUTES = frozenset(
+        {
+            "absolute",
+            "alignmentmode",
+            "aperturearea",
+            "aperturediameter",
+            "axisrates",
+            "bayeroffsetx",
+            "bayeroffsety",
+            "cameraxsize",
+            "cameraysize",
+            "canabortexposure",
+            "canasymmetricbin",
+            "canfastreadout",
+            "canfindhome",
+            "cangetcoolerpower",
+            "canmoveaxis",
+            "canpark",
+            "canpulseguide",
+            "canreverse",
+            "cansetaltitude",
+            "cansetazimuth",
+            "cansetccdtemperature",
+            "cansetdeclinationrate",
+            "cansetguiderates",
+            "cansetpark",
+            "cansetpierside",
+            "cansetrightascensionrate",
+            "cansetshutter",
+            "cansettracking",
+            "canslave",
+            "canslew",
+            "canslewaltaz",
+            "canslewaltazasync",
+            "canstopexposure",
+            "cansync",
+            "cansyncaltaz",
+            "cansyncazimuth",
+            "canwrite",
+            "driverinfo",
+            "driverversion",
+            "electronsperadu",
+            "equatorialsystem",
+            "exposuremax",
+            "exposuremin",
+            "exposureresolution",
+            "focallength",
+            "focusoffsets",
+            "fullwellcapacity",
+            "gainmax",
+            "gainmin",
+            "gains",
+            "getswitchdescription",
+            "getswitchname",
+            "hasshutter",
+            "interfaceversion",
+            "maxadu",
+            "maxbinx",
+            "maxbiny",
+            "maxincrement",
+            "maxstep",
+            "maxswitch",
+            "minswitchvalue",
+            "name",
+            "names",
+            "pixelsizex",
+            "pixelsizey",
+            "readoutmodes",
+            "sensorname",
+            "sensortype",
+            "stepsize",
+            "supportedactions",
+            "switchstep",
+            "tempcompavailable",
+            "trackingrates",
+        }
+    )
+
     def __init__(self, sys_id: str, parent: Union["Component", None]) -> None:
         """Initialize Device object."""
         super().__init__(sys_id=sys_id, parent=parent)
+        self._constants = {}
+        # (monotonic time, value) of recent GET requests, dropped by every PUT
+        self._recent = {}
+        # Counts the PUT requests, a GET overlapping a PUT does not fill _recent
+        self._puts = 0
+        # (monotonic time, values) of the last refresh_state
+        self._state = None
+        # Devicestate support, None until the interface version is known
+        self._has_devicestate: Optional[bool] = None
+        # Pending GET requests, threads asking for the same value share one request
+        self._inflight: dict[tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
 
     def _get(self, attribute: str, **data):
         """Send an request and check response for errors.
 
+        Attributes listed in CONSTANT_ATTRIBUTES are requested from the
+        server only once while the device stays connected. Other scalar
+        values are reused for DEVICE_GET_TTL seconds, or GET_TTL of the
+        attribute, until the next PUT request. Threads asking for a value which is already
+        requested wait for that request.
+
         Args:
             attribute (str): Attribute to get from server.
             **data: Data to send with request.
 
         """
-        return self.connector.get(self, attribute, **data)
+        key = (attribute, tuple(sorted(data.items())))
+        if attribute in self.CONSTANT_ATTRIBUTES:
+            try:
+                return self._constants[key]
+            except KeyError:
+                value = self._constants[key] = self._get_shared(key, attribute, data)
+                return value
+        recent = self._recent.get(key)
+        if recent is not None:
+            if time.monotonic() - recent[0] < self.GET_TTL.get(attribute, DEVICE_GET_TTL):
+                return recent[1]
+            self._recent.pop(key, None)
+        puts = self._puts
+        value = self._get_shared(key, attribute, data)
+        # Lists like imagearray or devicestate are neither kept alive nor shared between callers
+        if puts == self._puts and isinstance(value, _SCALAR_TYPES):
+            self._recent[key] = (time.monotonic(), value)
+        return value
+
+    def _get_shared(self, key: tuple, attribute: str, data: dict):
+        """Send the request, or wait for the identical one already pending.
+
+        Args:
+            key (tuple): Attribute and sorted data identifying the request.
+            attribute (str): Attribute to get from server.
+            data (dict): Data to send with request.
+
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return future.result()
+        try:
+            # The connector is resolved in _setup, skip the property on this hot path
+            value = self._resolved_connector.get(self, attribute, **data)
+        except BaseException as exc:
+            self._finish_shared(key)
+            future.set_exception(exc)
+            raise
+        self._finish_shared(key)
+        future.set_result(value)
+        return value
+
+    def _finish_shared(self, key: tuple) -> None:
+        """Remove a request from the pending ones, later callers send a new one."""
+        with self._inflight_lock:
+            del self._inflight[key]
+
+    def invalidate(self, attribute: Optional[str] = None) -> None:
+        """Drop cached constant attributes so they are read from the server again.
+
+        Args:
+            attribute (str): Attribute to drop, all attributes if None.
+
+        """
+        if attribute is None:
+            self._constants.clear()
+            return
+        for key in [key for key in self._constants if key[0] == attribute]:
+            del self._constants[key]
+
+    def refresh_state(self) -> dict[str, Any]:
+        """Read all operational state properties of the device in one request.
+
+        Uses the devicestate endpoint of interface version 3 devices. The
+        state getters serve the values for DEVICE_STATE_TTL seconds or until
+        the next PUT request.
+
+        Returns:
+            Dictionary of the state values by lower case property name.
+
+        """
+        state = {item["Name"].lower(): item["Value"] for item in self._get("devicestate")}
+        self._state = (time.monotonic(), state)
+        return state
+
+    def _get_state(self, attribute: str):
+        """Get a state attribute, taken from a recent refresh_state if possible.
+
+        An outdated state is refreshed with a single devicestate request.
+        Concurrent state getters of a poll share that request, so they cost
+        one round-trip together. Drivers with an older interface version, or
+        failing to answer devicestate, are asked for the attribute itself.
+
+        Args:
+            attribute (str): Attribute to get from server.
+
+        """
+        if self._state is not None:
+            timestamp, state = self._state
+            if time.monotonic() - timestamp < DEVICE_STATE_TTL:
+                if attribute in state:
+                    return state[attribute]
+                return self._get(attribute)
+        if self._has_devicestate is None:
+            try:
+                self._has_devicestate = self.interfaceversion() >= self.DEVICESTATE_INTERFACE_VERSION
+            except DeviceResponseError:
+                self._has_devicestate = False
+        if self._has_devicestate:
+            try:
+                state = self.refresh_state()
+            except DeviceResponseError:
+                logger.debug("%s: No devicestate support, reading properties one by one", self.sys_id)
+                self._has_devicestate = False
+            except RequestConnectionError:
+                # Not remembered, the property request tells whether the device is reachable at all
+                pass
+            else:
+                if attribute in state:
+                    return state[attribute]
+        return self._get(attribute)
+
+    def batch_get(self, attributes: List[str]) -> dict[str, Any]:
+        """Get several attributes from the server at once.
+
+        The requests are sent concurrently over the keep-alive connections
+        of the connector, so a poll costs about one round-trip instead of
+        one per attribute.
+
+        Args:
+            attributes (list): Attributes to get from server.
+
+        Returns:
+            Dictionary of the attribute values by attribute name.
+
+        """
+        futures = {attribute: _BATCH_EXECUTOR.submit(self._get, attribute) for attribute in attributes}
+        return {attribute: future.result() for attribute, future in futures.items()}
+
+    def run_nowait(self, method: Callable[..., Any], *args, **kwargs) -> Future:
+        """Run a device method in the background, e.g. `dome.run_nowait(dome.park)`.
+
+        Commands for several devices are sent side by side, so a sequence
+        like parking dome and telescope costs about one round-trip. Commands
+        run this way for the same device may reach it in any order.
+
+        Args:
+            method (callable): Method of this device to run.
+            *args: Positional arguments of the method.
+            **kwargs: Keyword arguments of the method.
+
+        Returns:
+            Future of the result, raising the error of the method if it failed.
+
+        """
+        return _BATCH_EXECUTOR.submit(method, *args, **kwargs)
+
+    def wait_until(
+        self, attribute: str, target: Any, timeout: float, interval: float = DEVICE_POLL_INTERVAL
+    ) -> bool:
+        """Poll an attribute until it has the target value, e.g. slewing False after a slew.
+
+        Returns as soon as the target is read, there is no sleep after the
+        successful check. The last sleep is cut short at the deadline.
+
+        Args:
+            attribute (str): Attribute to get from server.
+            target: Value to wait for.
+            timeout (float): Seconds to wait at most.
+            interval (float): Seconds between two requests.
+
+        Returns:
+            True if the target was reached, False on timeout.
+
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._get_state(attribute) == target:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
 
     def _put(self, attribute: str, **data):
         """Send an HTTP PUT request to an Alpaca server and check response for errors.
@@ -181,7 +521,18 @@ class Device(Component):
             **data: Data to send with request.
 
         """
-        return self.connector.put(self, attribute, **data)
+        if attribute == "connected":
+            # The hardware behind the driver may differ after a reconnect
+            self._constants.clear()
+            self._has_devicestate = None
+        self._puts += 1
+        self._recent.clear()
+        self._state = None
+        reply = self._resolved_connector.put(self, attribute, **data)
+        # Dropped once the server applied the new setting
+        for dependent in self.INVALIDATED_BY_PUT.get(attribute, ()):
+            self.invalidate(dependent)
+        return reply
 
     def action(self, Action: str, *Parameters):
         """Access functionality beyond the built-in capabilities of the ASCOM device interfaces.
@@ -248,7 +599,13 @@ class Device(Component):
 
     def driverinfo(self) -> List[str]:
         """Get information of the device."""
-        return [i.strip() for i in self._get("driverinfo").split(",")]
+        # Parsed once, cleared together with the cached driverinfo string on reconnect
+        key = ("driverinfo", "parsed")
+        try:
+            parsed = self._constants[key]
+        except KeyError:
+            parsed = self._constants[key] = tuple(i.strip() for i in self._get("driverinfo").split(","))
+        return list(parsed)
 
     def driverversion(self) -> str:
         """Get string containing only the major and minor version of the driver."""
@@ -270,6 +627,8 @@ class Device(Component):
 class Switch(Device):
     """Switch specific methods."""
 
+    __slots__ = ()
+
     def maxswitch(self) -> int:
         """Count of switch devices managed by this driver.
 
@@ -433,6 +792,8 @@ class Switch(Device):
 class SafetyMonitor(Device):
     """Safety monitor specific methods."""
 
+    __slots__ = ()
+
     def issafe(self) -> bool:
         """Indicate whether the monitored state is safe for use.
 
@@ -446,6 +807,8 @@ class SafetyMonitor(Device):
 class Dome(Device):
     """Dome specific methods."""
 
+    __slots__ = ()
+
     def altitude(self) -> float:
         """Dome altitude.
 
@@ -672,18 +1035,115 @@ class Dome(Device):
         self._put("synctoazimuth", Azimuth=Azimuth)
 
 
-class ImageArrayElementTypes:
+class ImageArrayElementTypes(IntEnum):
     """The native data type of ImageArray pixels"""
 
     Unknown = 0
     Int16 = 1
     Int32 = 2
     Double = 3
-    Single = 4, "Unused in Alpaca 2022"
-    UInt64 = 5, "Unused in Alpaca 2022"
-    Byte = 6, "Unused in Alpaca 2022"
-    Int64 = 7, "Unused in Alpaca 2022"
-    UInt16 = 8, "Unused in Alpaca 2022"
+    Single = 4
+    UInt64 = 5
+    Byte = 6
+    Int64 = 7
+    UInt16 = 8
+
+
+# Element types defined for the ImageBytes transfer only
+_IMAGE_ELEMENT_TYPES_UNUSED = {
+    ImageArrayElementTypes.Single: "Unused in Alpaca 2022",
+    ImageArrayElementTypes.UInt64: "Unused in Alpaca 2022",
+    ImageArrayElementTypes.Byte: "Unused in Alpaca 2022",
+    ImageArrayElementTypes.Int64: "Unused in Alpaca 2022",
+    ImageArrayElementTypes.UInt16: "Unused in Alpaca 2022",
+}
+
+
+# OpenCV conversions of an RGGB matrix by Bayer offset (x, y)
+_BAYER_RGGB_CODES = {
+    (0, 0): "COLOR_BayerBG2RGB",
+    (1, 0): "COLOR_BayerGB2RGB",
+    (0, 1): "COLOR_BayerGR2RGB",
+    (1, 1): "COLOR_BayerRG2RGB",
+}
+
+# ImageBytes metadata version 1, eleven little endian int32 fields
+_IMAGEBYTES_HEADER = struct.Struct("<11i")
+
+# Bytes read from the image stream at once
+_IMAGEBYTES_CHUNK_SIZE = 1 << 20
+
+# Numpy types of the ImageBytes transmission element types, always little endian
+_IMAGEBYTES_DTYPES = {
+    ImageArrayElementTypes.Int16: np.dtype("<i2"),
+    ImageArrayElementTypes.Int32: np.dtype("<i4"),
+    ImageArrayElementTypes.Double: np.dtype("<f8"),
+    ImageArrayElementTypes.Single: np.dtype("<f4"),
+    ImageArrayElementTypes.UInt64: np.dtype("<u8"),
+    ImageArrayElementTypes.Byte: np.dtype("u1"),
+    ImageArrayElementTypes.Int64: np.dtype("<i8"),
+    ImageArrayElementTypes.UInt16: np.dtype("<u2"),
+}
+
+
+def _readinto_exact(raw, buffer: memoryview) -> None:
+    """Fill the buffer from the raw response stream.
+
+    Args:
+        raw (HTTPResponse): The undecoded response stream.
+        buffer (memoryview): Byte view of the target storage.
+
+    """
+    filled = 0
+    while filled < len(buffer):
+        try:
+            # urllib3 reads into a temporary bytes object first, keep it small
+            n = raw.readinto(buffer[filled : filled + _IMAGEBYTES_CHUNK_SIZE])
+        except (IOError, ProtocolError) as exc:
+            raise RequestConnectionError from exc
+        if not n:
+            raise AlpacaHttpError(f"ImageBytes response truncated after {filled} of {len(buffer)} bytes")
+        filled += n
+
+
+def _debayer_rggb(image: np.ndarray, offset_x: int, offset_y: int) -> np.ndarray:
+    """Interpolate the RGB planes of an RGGB Bayer image.
+
+    Args:
+        image (ndarray): The raw image indexed [x][y].
+        offset_x (int): X offset of the Bayer matrix in the image.
+        offset_y (int): Y offset of the Bayer matrix in the image.
+
+    Returns:
+        The image indexed [x][y][plane] with the red, green and blue planes.
+
+    """
+    # OpenCV is only needed for colour cameras
+    import cv2
+
+    # OpenCV expects rows of y and names the patterns after the second row
+    mosaic = np.ascontiguousarray(image.T)
+    if mosaic.dtype not in (np.uint8, np.uint16):
+        mosaic = np.clip(mosaic.astype(np.float32), 0, np.iinfo(np.uint16).max).astype(np.uint16)
+    rgb = cv2.cvtColor(mosaic, getattr(cv2, _BAYER_RGGB_CODES[(offset_x, offset_y)]))
+    return rgb.transpose(1, 0, 2)
+
+
+def _narrow_image(image: np.ndarray) -> np.ndarray:
+    """Downcast integer pixels sent as 32 or 64 bit to 16 bit if all values fit.
+
+    Cameras usually acquire 16 bit data, narrowing halves the memory of the
+    image and keeps the fast paths for 16 bit images downstream.
+    """
+
+    if image.dtype.kind not in "iu" or image.dtype.itemsize <= 2 or image.size == 0:
+        return image
+    lo, hi = image.min(), image.max()
+    for dtype in (np.uint16, np.int16):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return image.astype(dtype)
+    return image
 
 
 class ImageMetadata:
@@ -693,6 +1153,8 @@ class ImageMetadata:
         * See https://ascom-standards.org/Developer/AlpacaImageBytes.pdf
     """
 
+    __slots__ = ("metavers", "imgtype", "xmtype", "rank", "x_size", "y_size", "z_size")
+
     def __init__(
         self,
         metadata_version: int,
@@ -761,6 +1223,10 @@ class ImageMetadata:
 class Camera(Device):
     """Camera specific methods."""
 
+    DEVICESTATE_INTERFACE_VERSION = 4
+
+    __slots__ = ("img_desc",)
+
     def bayeroffsetx(self) -> int:
         """Return the X offset of the Bayer matrix, as defined in SensorType."""
         return self._get("bayeroffsetx")
@@ -978,6 +1444,50 @@ class Camera(Device):
         # return self._get_imagedata("imagearray")
         return self._get("imagearray")
 
+    def imagearraybytes(self, debayer: bool = False, downcast: Optional[np.dtype] = None) -> np.ndarray:
+        """Return the exposure pixel values as a numpy array.
+
+        Requests the image in the Alpaca ImageBytes format which is decoded
+        directly into a numpy array. Servers not supporting ImageBytes answer
+        with the JSON image array which is converted to a numpy array.
+
+        Args:
+            debayer (bool): Convert unbinned images of RGGB sensors to RGB planes.
+            downcast (dtype): Return the pixels with this type, e.g. np.uint8 for
+                focus or preview loops. Narrower unsigned types keep the most
+                significant bits below maxadu, other types are a plain cast.
+
+        Returns:
+            Array containing the exposure pixel values.
+
+        """
+        image = self._get_imagedata("imagearray")
+        if debayer and self.img_desc.Rank == 2 and self.sensortype() == SENSOR_TYPE_RGGB:
+            if self.binx() == 1 and self.biny() == 1:
+                # The Bayer offsets refer to the full frame, a subframe may start on another color
+                image = _debayer_rggb(
+                    image,
+                    (self.bayeroffsetx() + self.startx()) % 2,
+                    (self.bayeroffsety() + self.starty()) % 2,
+                )
+        if downcast is not None:
+            image = self._downcast_image(image, np.dtype(downcast))
+        return image
+
+    def _downcast_image(self, image: np.ndarray, dtype: np.dtype) -> np.ndarray:
+        """Convert the image to the given pixel type.
+
+        Args:
+            image (ndarray): The image as received.
+            dtype (dtype): The requested pixel type.
+
+        """
+        if dtype.kind != "u" or image.dtype.kind not in "iu" or image.dtype.itemsize <= dtype.itemsize:
+            return image.astype(dtype, copy=False)
+        # Most cameras use fewer bits than the transmitted type, scale by the real range
+        shift = max(0, int(self.maxadu()).bit_length() - 8 * dtype.itemsize)
+        return np.right_shift(np.clip(image, 0, None), shift).clip(0, np.iinfo(dtype).max).astype(dtype)
+
     def imagearrayvariant(self) -> List[int]:
         r"""Return an array of integers containing the exposure pixel values.
 
@@ -1145,6 +1655,39 @@ class Camera(Device):
             return self._get("startx")
         self._put("startx", StartX=StartX)
 
+    def set_roi(self, StartX: int, StartY: int, NumX: int, NumY: int, CurrentNumX: int, CurrentNumY: int):
+        """Set the subframe start position and size in an order which is valid for strict drivers.
+
+        Notes:
+            Alpaca has no combined call, this sends the four PUT requests
+            one after another. Drivers may check StartX + NumX and
+            StartY + NumY against the sensor size whenever one of them is
+            set, so the subframe is first shrunk, then moved and then grown
+            to its new size, keeping each step within the sensor. The caller
+            passes the current size, which it usually knows already.
+
+        Args:
+            StartX (int): The subframe X axis start position in binned pixels.
+            StartY (int): The subframe Y axis start position in binned pixels.
+            NumX (int): The subframe width in binned pixels.
+            NumY (int): The subframe height in binned pixels.
+            CurrentNumX (int): The subframe width currently set in binned pixels.
+            CurrentNumY (int): The subframe height currently set in binned pixels.
+
+        """
+        shrink_x = NumX < CurrentNumX
+        shrink_y = NumY < CurrentNumY
+        if shrink_x:
+            self._put("numx", NumX=NumX)
+        if shrink_y:
+            self._put("numy", NumY=NumY)
+        self._put("startx", StartX=StartX)
+        self._put("starty", StartY=StartY)
+        if not shrink_x:
+            self._put("numx", NumX=NumX)
+        if not shrink_y:
+            self._put("numy", NumY=NumY)
+
     def starty(self, StartY: Optional[int] = None) -> int:
         """Set or return the current subframe Y axis start position.
 
@@ -1198,142 +1741,134 @@ class Camera(Device):
         """
         self._put("stopexposure")
 
-    def _get_imagedata(self, attribute: str, **data) -> str:
-        """TBD
+    def _get_imagedata(self, attribute: str, **data) -> np.ndarray:
+        """Get image data from the server, preferably in the ImageBytes format.
+
         Args:
             attribute (str): Attribute to get from server.
             **data: Data to send with request.
 
         """
-        import array
-
-        import requests
-
-        self.base_url = "http://192.168.1.233:11111/api/v1/camera/1/"
-        url = f"{self.base_url}/{attribute}"
-        hdrs = {"accept": "application/imagebytes"}
+        # Pixel data hardly compresses, spare the server and us the gzip round-trip
+        hdrs = {"accept": "application/imagebytes", "accept-encoding": "identity"}
         # Make Host: header safe for IPv6
         # if(self.address.startswith('[') and not self.address.startswith('[::1]')):
         #     hdrs['Host'] = f'{self.address.split("%")[0]}]'
-        pdata = {"ClientTransactionID": f"4711", "ClientID": f"1"}
-        pdata.update(data)
-        # try:
-        #     Device._ctid_lock.acquire()
-        #     response = requests.get("%s/%s" % (self.base_url, attribute), params=pdata, headers=hdrs)
-        #     Device._client_trans_id += 1
-        # finally:
-        #     Device._ctid_lock.release()
-        response = requests.get("%s/%s" % (self.base_url, attribute), params=pdata, headers=hdrs)
+        # Keep-alive session and client ids of the connector, the image is downloaded on every exposure
+        with self.connector.get_response(self, attribute, headers=hdrs, stream=True, **data) as response:
+            return self._decode_imagedata(response)
+
+    def _decode_imagedata(self, response) -> np.ndarray:
+        """Decode a streamed ImageBytes or JSON image response.
+
+        Args:
+            response (Response): The streamed response of the image request.
 
+        """
         if response.status_code not in range(200, 204):  # HTTP level errors
-            raise Exception(
-                response.status_code,
-                f"{response.reason}: {response.text} (URL {response.url})",
-            )
+            raise AlpacaHttpError(f"{response.status_code} {response.reason}: {response.text} (URL {response.url})")
 
         ct = response.headers.get("content-type")  # case insensitive
-        m = "little"
         #
         # IMAGEBYTES
         #
         if ct == "application/imagebytes":
-            b = response.content
-            n = int.from_bytes(b[4:8], m)
-            if n != 0:
-                m = response.text[44:].decode(encoding="UTF-8")
-                raise_alpaca_if(n, m)  # Will raise here
+            # Read the header first, the pixels are streamed straight into the array below
+            raw = response.raw
+            raw.decode_content = True
+            b = bytearray(_IMAGEBYTES_HEADER.size)
+            _readinto_exact(raw, memoryview(b))
+            (
+                metadata_version,
+                error_number,
+                _,  # Client transaction id
+                _,  # Server transaction id
+                data_start,
+                image_element_type,
+                transmission_element_type,
+                rank,
+                dimension1,
+                dimension2,
+                dimension3,
+            ) = _IMAGEBYTES_HEADER.unpack(b)
+            if error_number != 0:
+                raise AlpacaError(error_number, raw.read().decode(encoding="UTF-8"))
             self.img_desc = ImageMetadata(
-                int.from_bytes(b[0:4], m),  # Meta version
-                int.from_bytes(b[20:24], m),  # Image element type
-                int.from_bytes(b[24:28], m),  # Xmsn element type
-                int.from_bytes(b[28:32], m),  # Rank
-                int.from_bytes(b[32:36], m),  # Dimension 1
-                int.from_bytes(b[36:40], m),  # Dimension 2
-                int.from_bytes(b[40:44], m),  # Dimension 3
+                metadata_version,
+                image_element_type,
+                transmission_element_type,
+                rank,
+                dimension1,
+                dimension2,
+                dimension3,
             )
-            print(self.img_desc.x_size)
-            print(self.img_desc.y_size)
-            print(self.img_desc.z_size)
-            #
-            # Bless you Kelly Bundy and Mark Ransom
-            # https://stackoverflow.com/questions/71774719/native-array-frombytes-not-numpy-mysterious-behavior/71776522#71776522
-            #
-            # if self.img_desc.TransmissionElementType == ImageArrayElementTypes.Int16.value:
-            #     tcode = 'h'
-            # elif self.img_desc.TransmissionElementType == ImageArrayElementTypes.UInt16.value:
-            #     tcode = 'H'
-            # elif self.img_desc.TransmissionElementType == ImageArrayElementTypes.Int32.value:
-            #     tcode = 'l'
-            # elif self.img_desc.TransmissionElementType == ImageArrayElementTypes.Double.value:
-            #     tcode = 'd'
-            # # Extension types for future. 64-bit pixels are unlikely to be seen on the wire
-            # elif self.img_desc.TransmissionElementType == ImageArrayElementTypes.Byte.value:
-            #     tcode = 'B'     # Unsigned
-            # elif self.img_desc.TransmissionElementType == ImageArrayElementTypes.UInt32.value:
-            #     tcode = 'L'
-            # else:
-            #    raise Exception("Unknown or as-yet unsupported ImageBytes Transmission Array Element Type")
-            tcode = "H"
-            #
-            # Assemble byte stream back into indexable machine data types
-            #
-            a = array.array(tcode)
-            data_start = int.from_bytes(b[16:20], m)
-            a.frombytes(b[data_start:])  # 'h', 'H', 16-bit ints 2 bytes get turned into Python 32-bit ints
-            #
-            # Convert to common Python nested list "array".
-            #
-            l = []
-            rows = self.img_desc.Dimension1
-            cols = self.img_desc.Dimension2
+            logger.debug(
+                "Image shape %dx%dx%d, type=%d",
+                self.img_desc.x_size,
+                self.img_desc.y_size,
+                self.img_desc.z_size,
+                self.img_desc.TransmissionElementType,
+            )
+            try:
+                dtype = _IMAGEBYTES_DTYPES[self.img_desc.TransmissionElementType]
+            except KeyError:
+                raise AlpacaHttpError(
+                    f"Unsupported ImageBytes transmission element type {self.img_desc.TransmissionElementType}"
+                ) from None
+            _readinto_exact(raw, memoryview(bytearray(data_start - len(b))))
+            shape = (self.img_desc.Dimension1, self.img_desc.Dimension2)
             if self.img_desc.Rank == 3:
-                for i in range(rows):
-                    rowidx = i * cols * 3
-                    r = []
-                    for j in range(cols):
-                        colidx = j * 3
-                        r.append(a[colidx : colidx + 3])
-                    l.append(r)
-            else:
-                for i in range(rows):
-                    rowidx = i * cols
-                    l.append(a[rowidx : rowidx + cols])
-
-            return l  # Nested lists
+                shape += (self.img_desc.Dimension3,)
+            a = np.empty(shape, dtype=dtype)
+            _readinto_exact(raw, memoryview(a).cast("B"))
+            # Reaching the end of the body hands the connection back to the pool
+            raw.read()
+            return _narrow_image(a)
         #
         # JSON IMAGE DATA -> List of Lists (row major)
         #
         else:
-            j = response.json()
-            n = j["ErrorNumber"]
-            m = j["ErrorMessage"]
-            # raise Exception(n, m)                   # Raise Alpaca Exception if non-zero Alpaca error
+            try:
+                content = response.content
+            except IOError as exc:
+                raise RequestConnectionError from exc
+            try:
+                j = json.loads(content)
+            except ValueError as exc:
+                # e.g. an error page of a proxy or a truncated body
+                raise AlpacaHttpError(f"HTTP {response.status_code}: {response.text}") from exc
+            error_number = j["ErrorNumber"]
+            if error_number != 0:
+                raise AlpacaError(error_number, j["ErrorMessage"])
             l = j["Value"]  # Nested lists
-            if type(l[0][0]) == list:  # Test & pick up color plane
-                r = 3
-                d3 = len(l[0][0])
-            else:
-                r = 2
-                d3 = 0
+            # Type and Rank are part of the reply, the nested lists need no probing
+            element_type = j.get("Type", ImageArrayElementTypes.Int32)
+            r = j.get("Rank") or (3 if isinstance(l[0][0], list) else 2)
             self.img_desc = ImageMetadata(
                 1,  # Meta version
-                ImageArrayElementTypes.Int32,  # Image element type
-                ImageArrayElementTypes.Int32,  # Xmsn element type
+                element_type,  # Image element type
+                element_type,  # Xmsn element type
                 r,  # Rank
                 len(l),  # Dimension 1
                 len(l[0]),  # Dimension 2
-                d3,  # Dimension 3
+                len(l[0][0]) if r == 3 else 0,  # Dimension 3
             )
-            return l
+            # Integer pixels are converted straight to 32 bit instead of numpy's default 64 bit
+            dtype = np.float64 if element_type == ImageArrayElementTypes.Double else np.int32
+            return _narrow_image(np.asarray(l, dtype=dtype))
 
 
 class CameraFile(Device):
     """CameraFile specific methods."""
 
+    __slots__ = ()
+
 
 class FilterWheel(Device):
     """Filter wheel specific methods."""
 
+    __slots__ = ()
+
     def focusoffsets(self) -> List[int]:
         """Filter focus offsets.
 
@@ -1381,6 +1916,10 @@ class FilterWheel(Device):
 class Telescope(Device):
     """Telescope specific methods."""
 
+    DEVICESTATE_INTERFACE_VERSION = 4
+
+    __slots__ = ()
+
     def alignmentmode(self):
         """Return the current mount alignment mode.
 
@@ -1397,7 +1936,7 @@ class Telescope(Device):
             Altitude of the telescope's current position (degrees, positive up).
 
         """
-        return self._get("altitude")
+        return self._get_state("altitude")
 
     def aperturearea(self):
         """Return the telescope's aperture.
@@ -1425,7 +1964,7 @@ class Telescope(Device):
             telescope does not support homing.
 
         """
-        return self._get("athome")
+        return self._get_state("athome")
 
     def atpark(self):
         """Indicate whether the telescope is at the park position.
@@ -1435,7 +1974,7 @@ class Telescope(Device):
             method. Set False by calling the unpark() method.
 
         """
-        return self._get("atpark")
+        return self._get_state("atpark")
 
     def azimuth(self):
         """Return the telescope's aperture.
@@ -1445,7 +1984,7 @@ class Telescope(Device):
             positive East/clockwise).
 
         """
-        return self._get("azimuth")
+        return self._get_state("azimuth")
 
     def canfindhome(self):
         """Indicate whether the mount can find the home position.
@@ -1596,7 +2135,7 @@ class Telescope(Device):
             in the coordinate system given by the EquatorialSystem property.
 
         """
-        return self._get("declination")
+        return self._get_state("declination")
 
     def declinationrate(self, DeclinationRate: Optional[float] = None):
         """Set or return the telescope's declination tracking rate.
@@ -1685,7 +2224,7 @@ class Telescope(Device):
             True if a pulseguide(int, int) command is in progress, False otherwise.
 
         """
-        return self._get("ispulseguiding")
+        return self._get_state("ispulseguiding")
 
     def rightascension(self):
         """Return the telescope's right ascension coordinate.
@@ -1696,7 +2235,7 @@ class Telescope(Device):
             property.
 
         """
-        return self._get("rightascension") / 24 * 360  # hourangle -> deg
+        return self._get_state("rightascension") * _HOURS_TO_DEG  # hourangle -> deg
 
     def rightascensionrate(self, RightAscensionRate: Optional[float] = None):
         """Set or return the telescope's right ascension tracking rate.
@@ -1736,7 +2275,7 @@ class Telescope(Device):
             sidereal).
 
         """
-        return self._get("siderealtime")
+        return self._get_state("siderealtime")
 
     def siteelevation(self, SiteElevation: Optional[float] = None):
         """Set or return the observing site's elevation above mean sea level.
@@ -1791,7 +2330,7 @@ class Telescope(Device):
             or the moveaxis(int, float) method, False at all other times.
 
         """
-        return self._get("slewing")
+        return self._get_state("slewing")
 
     def slewsettletime(self, SlewSettleTime: Optional[int] = None):
         """Set or return the post-slew settling time.
@@ -1836,9 +2375,9 @@ class Telescope(Device):
         """
 
         if TargetRightAscension is None:
-            return self._get("targetrightascension") / 24 * 360  # hourangle -> deg
+            return self._get("targetrightascension") * _HOURS_TO_DEG  # hourangle -> deg
         TargetRightAscension, _ = check_equatorial_coordinates(TargetRightAscension, 0.0)
-        TargetRightAscension = TargetRightAscension / 360 * 24  # deg -> hour angle
+        TargetRightAscension = TargetRightAscension * _DEG_TO_HOURS  # deg -> hour angle
         self._put("targetrightascension", TargetRightAscension=TargetRightAscension)
 
     def tracking(self, Tracking: Optional[bool] = None):
@@ -1893,12 +2432,12 @@ class Telescope(Device):
         if UTCDate is None:
             return self._get("utcdate")
 
-        if type(UTCDate) is str:
-            data = UTCDate
-        elif type(UTCDate) is datetime:
+        if isinstance(UTCDate, datetime):
             data = UTCDate.isoformat()
+        elif isinstance(UTCDate, str):
+            data = UTCDate
         else:
-            raise TypeError()
+            raise TypeError(f"UTCDate must be str or datetime, not {type(UTCDate).__name__}")
 
         self._put("utcdate", UTCDate=data)
 
@@ -1940,7 +2479,7 @@ class Telescope(Device):
         """
 
         RightAscension, Declination = check_equatorial_coordinates(RightAscension, Declination)
-        RightAscension = RightAscension / 360 * 24  # deg -> hour angle
+        RightAscension = RightAscension * _DEG_TO_HOURS  # deg -> hour angle
 
         return self._get(
             "destinationsideofpier",
@@ -2017,7 +2556,7 @@ class Telescope(Device):
 
         """
         RightAscension, Declination = check_equatorial_coordinates(RightAscension, Declination)
-        RightAscension = RightAscension / 360 * 24  # deg -> hour angle
+        RightAscension = RightAscension * _DEG_TO_HOURS  # deg -> hour angle
         self._put("slewtocoordinates", RightAscension=RightAscension, Declination=Declination)
 
     def slewtocoordinatesasync(self, RightAscension: Union[float, str], Declination: Union[float, str]):
@@ -2029,7 +2568,7 @@ class Telescope(Device):
 
         """
         RightAscension, Declination = check_equatorial_coordinates(RightAscension, Declination)
-        RightAscension = RightAscension / 360 * 24  # deg -> hour angle
+        RightAscension = RightAscension * _DEG_TO_HOURS  # deg -> hour angle
         self._put(
             "slewtocoordinatesasync",
             RightAscension=RightAscension,
@@ -2065,7 +2604,7 @@ class Telescope(Device):
 
         """
         RightAscension, Declination = check_equatorial_coordinates(RightAscension, Declination)
-        RightAscension = RightAscension / 360 * 24  # deg -> hour angle
+        RightAscension = RightAscension * _DEG_TO_HOURS  # deg -> hour angle
         self._put("synctocoordinates", RightAscension=RightAscension, Declination=Declination)
 
     def synctotarget(self):
@@ -2080,6 +2619,10 @@ class Telescope(Device):
 class Focuser(Device):
     """Focuser specific methods."""
 
+    DEVICESTATE_INTERFACE_VERSION = 4
+
+    __slots__ = ()
+
     def absolute(self) -> bool:
         """Indicates whether the focuser is capable of absolute position
 
@@ -2184,6 +2727,10 @@ class Focuser(Device):
 class Rotator(Device):
     """Rotator specific methods."""
 
+    DEVICESTATE_INTERFACE_VERSION = 4
+
+    __slots__ = ()
+
     def canreverse(self) -> bool:
         """Indicates whether the Rotator supports the Reverse method
 
@@ -2299,14 +2846,17 @@ class Rotator(Device):
         self._put("sync", Position=Position)
 
 
-_component_classes = {
-    "telescope": Telescope,
-    "dome": Dome,
-    "camera": Camera,
-    "filterwheel": FilterWheel,
-    "focuser": Focuser,
-    "rotator": Rotator,
-    "switch": Switch,
-    "safetymonitor": SafetyMonitor,
-    "file": CameraFile,
-}
+# Read-only, the string literal keys are interned by the compiler already
+_component_classes = MappingProxyType(
+    {
+        "telescope": Telescope,
+        "dome": Dome,
+        "camera": Camera,
+        "filterwheel": FilterWheel,
+        "focuser": Focuser,
+        "rotator": Rotator,
+        "switch": Switch,
+        "safetymonitor": SafetyMonitor,
+        "file": CameraFile,
+    }
+)